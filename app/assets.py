@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # opcional (pip install brotli): sem ele, só gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Arquivos com hash na URL nunca mudam; os demais (index, URL sem hash) sempre revalidam pelo ETag
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS_BYTES = 256
+
+_COMPRESSIBLE = re.compile(r"^(?:text/|application/(?:javascript|json|xml)|image/svg\+xml)")
+_STATIC_REF = re.compile(r'(?P<attr>href|src)="/static/(?P<path>[^"?#]+)"')
+
+
+class Asset:
+    # Conteúdo em memória com as versões pré-comprimidas e um ETag forte por codificação
+
+    def __init__(self, data: bytes, media_type: str):
+        self.media_type = media_type
+        self.digest = hashlib.sha256(data).hexdigest()
+        tag = self.digest[:16]
+        self.variants: Dict[str, tuple] = {"identity": (data, f'"{tag}"')}
+        if len(data) >= MIN_COMPRESS_BYTES and _COMPRESSIBLE.match(media_type):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants["gzip"] = (compressed, f'"{tag}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants["br"] = (compressed, f'"{tag}-br"')
+
+    @property
+    def etags(self):
+        return {etag for _, etag in self.variants.values()}
+
+    def stats(self) -> Dict:
+        return {encoding: len(body) for encoding, (body, _) in self.variants.items()}
+
+
+def _accepted_encodings(header: str) -> set:
+    # Accept-Encoding com q-values: "gzip;q=0" recusa explicitamente
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    if "*" in accepted:
+        accepted.update(("br", "gzip"))
+    return accepted
+
+
+def _etag_matches(header: str, etags: set) -> bool:
+    # If-None-Match usa comparação fraca: ignora o prefixo W/
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in etags:
+            return True
+    return False
+
+
+class StaticAssets:
+    # Arquivos de app/static carregados na memória uma vez no startup, já comprimidos (gzip e, se
+    # instalado, brotli). Cada arquivo responde também numa URL com o hash do conteúdo
+    # (/static/css/style.<hash>.css), que pode ficar em cache por um ano: o index.html é reescrito
+    # para apontar para elas, então um deploy com CSS/JS novos muda a URL e o navegador busca de novo.
+
+    def __init__(self, directory: Path, prefix: str = "/static"):
+        self.prefix = prefix
+        self._assets: Dict[str, Asset] = {}
+        self._hashed: Dict[str, str] = {}  # caminho original -> caminho com hash
+        self.index: Optional[Asset] = None
+
+        if not directory.exists():
+            logger.warning("Diretório de arquivos estáticos não encontrado: %s", directory)
+            return
+        for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+            name = path.relative_to(directory).as_posix()
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if media_type == "application/javascript":
+                # text/* recebem o charset do próprio Starlette
+                media_type += "; charset=utf-8"
+            asset = Asset(path.read_bytes(), media_type)
+            stem, dot, suffix = name.rpartition(".")
+            hashed = f"{stem}.{asset.digest[:10]}.{suffix}" if dot else f"{name}.{asset.digest[:10]}"
+            self._assets[name] = asset
+            self._assets[hashed] = asset
+            self._hashed[name] = hashed
+
+        index = directory / "index.html"
+        if index.exists():
+            html = _STATIC_REF.sub(self._rewrite, index.read_text(encoding="utf-8"))
+            self.index = Asset(html.encode("utf-8"), "text/html")
+        logger.info("Arquivos estáticos em memória: %d (brotli %s)", len(self._hashed),
+                    "ativo" if brotli is not None else "indisponível")
+
+    def _rewrite(self, match: re.Match) -> str:
+        return f'{match.group("attr")}="{self.url(match.group("path"))}"'
+
+    def url(self, name: str) -> str:
+        return f"{self.prefix}/{self._hashed.get(name, name)}"
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self._assets.get(name)
+
+    def is_hashed(self, name: str) -> bool:
+        return name in self._assets and name not in self._hashed
+
+    def response(self, request: Request, asset: Asset, cache_control: str = REVALIDATE) -> Response:
+        # Melhor codificação aceita pelo cliente; 304 quando o ETag enviado ainda vale
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        body, etag = asset.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, asset.etags):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=headers)
+
+    def stats(self) -> Dict:
+        return {name: asset.stats() for name, asset in self._assets.items() if name in self._hashed}
@@ -0,0 +1,115 @@
+import json
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Estimativa grosseira: ~4 caracteres por token, mais um custo fixo por item (ID e separadores)
+CHARS_PER_TOKEN = 4
+ITEM_OVERHEAD_TOKENS = 12
+PROMPT_OVERHEAD_TOKENS = 150
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + ITEM_OVERHEAD_TOKENS
+
+
+def parse_batch_payload(raw: bytes) -> List[Dict]:
+    # Aceita um array JSON ou JSONL; cada item pode ser uma string ou {"id": ..., "email_text": ...}
+    text = raw.decode("utf-8", errors="replace").strip()
+    if not text:
+        raise ValueError("Lote vazio.")
+
+    if text.startswith("["):
+        try:
+            entries = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e.msg} (linha {e.lineno})")
+    else:
+        entries = []
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSONL inválido na linha {lineno}: {e.msg}")
+
+    items = []
+    seen = set()
+    for idx, entry in enumerate(entries):
+        if isinstance(entry, str):
+            item_id, email_text = str(idx), entry
+        elif isinstance(entry, dict):
+            item_id = str(entry.get("id", idx))
+            email_text = entry.get("email_text") or entry.get("text") or ""
+        else:
+            raise ValueError(f"Item {idx} inválido: use uma string ou um objeto com 'email_text'.")
+
+        if item_id in seen:
+            raise ValueError(f"ID duplicado no lote: {item_id}")
+        seen.add(item_id)
+        items.append({"id": item_id, "email_text": str(email_text)})
+
+    if not items:
+        raise ValueError("Lote vazio.")
+    return items
+
+
+def make_batches(items: List[Dict], max_items: int, token_budget: int, max_chars: int = 512) -> List[List[Dict]]:
+    # Agrupa na ordem de chegada; fecha o lote ao atingir max_items ou o orçamento de tokens
+    batches = []
+    current = []
+    current_tokens = PROMPT_OVERHEAD_TOKENS
+    max_items = max(1, max_items)
+
+    for item in items:
+        tokens = estimate_tokens(item["email_text"][:max_chars])
+        if current and (len(current) >= max_items or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current = []
+            current_tokens = PROMPT_OVERHEAD_TOKENS
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(text: Optional[str]) -> Dict[str, Dict]:
+    # Aceita {"id": {"categoria": ..., "confianca": ...}}, {"id": "Categoria"} ou [{"id": ..., "categoria": ...}],
+    # com ou sem cercas ```json. Devolve {"id": {"categoria": ..., "confianca": ... ou None}}
+    if not text:
+        return {}
+
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        logger.warning("Resposta do lote não é JSON: %s", text[:200])
+        return {}
+
+    pairs = []
+    if isinstance(data, dict):
+        pairs = data.items()
+    elif isinstance(data, list):
+        pairs = [(entry.get("id"), entry) for entry in data if isinstance(entry, dict)]
+
+    answers = {}
+    for item_id, value in pairs:
+        confianca = None
+        if isinstance(value, dict):
+            categoria, confianca = value.get("categoria"), value.get("confianca")
+        else:
+            categoria = value
+        if item_id is None or categoria is None:
+            continue
+        answers[str(item_id)] = {"categoria": str(categoria).strip().strip(" '\"").title(), "confianca": confianca}
+    return answers
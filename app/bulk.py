@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# Classificação em lote offline, sem passar pela API HTTP.
+# Uso: python -m app.bulk caixa.mbox emails/ dados.jsonl --out resultados.jsonl [--resume] [--offline]
+# Entradas aceitas: arquivos mbox, diretórios com .eml/.txt/.pdf, arquivos .eml/.txt/.pdf soltos e JSONL
+# ({"id": "...", "email_text": "..."} por linha). A saída é escrita à medida que os resultados chegam.
+
+import argparse
+import csv
+import json
+import logging
+import mailbox
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from email import policy
+from email.parser import BytesParser
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from app.sanitizer import sanitize_email_text
+
+logger = logging.getLogger(__name__)
+
+# Mesmos limites do /classify, mas emails longos são truncados em vez de recusados
+MAX_RAW_CHARS = int(os.getenv("SANITIZE_MAX_INPUT_CHARS", "50000"))
+MAX_CHARS = 5000
+MIN_CHARS = 10
+FILE_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+FILE_SUFFIXES = {".eml", ".txt", ".pdf"}
+CSV_FIELDS = ["id", "sucesso", "categoria", "confianca", "metodo", "error"]
+
+
+class SharedRateGate:
+    # Teto global de chamadas por segundo, compartilhado entre os processos: cada chamada
+    # reserva o próximo horário livre sob um lock e dorme até ele (fora do lock)
+
+    def __init__(self, rate: float, ctx=None):
+        ctx = ctx or multiprocessing.get_context()
+        self.interval = 1.0 / rate
+        self._next = ctx.Value("d", 0.0)
+
+    def wait(self):
+        with self._next.get_lock():
+            now = time.monotonic()
+            slot = max(now, self._next.value)
+            self._next.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Leitura das entradas (processo principal): só enumera e lê bytes, o parsing fica com os workers
+
+Item = Tuple[str, str, object]  # (id, tipo, conteúdo) com tipo em text | eml | txt | pdf
+
+
+def iter_items(paths) -> Iterator[Item]:
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            yield from _iter_directory(path)
+        elif path.suffix.lower() == ".jsonl":
+            yield from _iter_jsonl(path)
+        elif path.suffix.lower() in FILE_SUFFIXES:
+            yield str(path), path.suffix.lower()[1:], str(path)
+        elif path.is_file():
+            yield from _iter_mbox(path)
+        else:
+            logger.warning("Entrada ignorada (não encontrada): %s", path)
+
+
+def _iter_directory(root: Path) -> Iterator[Item]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            suffix = Path(name).suffix.lower()
+            if suffix in FILE_SUFFIXES:
+                path = os.path.join(dirpath, name)
+                yield path, suffix[1:], path
+
+
+def _iter_jsonl(path: Path) -> Iterator[Item]:
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("%s:%d ignorada: JSON inválido", path, lineno)
+                continue
+            if isinstance(row, str):
+                row = {"email_text": row}
+            item_id = str(row.get("id") or f"{path}:{lineno}")
+            yield item_id, "text", str(row.get("email_text") or row.get("text") or "")
+
+
+def _iter_mbox(path: Path) -> Iterator[Item]:
+    box = mailbox.mbox(str(path), create=False)
+    try:
+        for key in box.iterkeys():
+            yield f"{path}#{key}", "eml", box.get_bytes(key)
+    finally:
+        box.close()
+
+
+# Workers: cada processo monta o próprio EmailClassifier uma única vez
+
+_classifier = None
+
+
+def _init_worker(offline: bool, rate_gate: Optional[SharedRateGate], log_level: int):
+    global _classifier
+    logging.basicConfig(level=log_level)
+    logging.getLogger().setLevel(log_level)
+
+    from app.classifier import EmailClassifier
+    _classifier = EmailClassifier()
+    if offline:
+        # Só cache, modelo local e keywords: sem rede, limitado apenas pela CPU
+        _classifier.ia_api_available = False
+    _classifier.rate_gate = rate_gate
+
+
+def _read_file(path: str, max_bytes: int) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(max_bytes)
+
+
+def _text_from_pdf(content: bytes) -> str:
+    from app.pdf import PDF_MAX_PAGES, PDF_TIMEOUT, extract_text_from_pdf
+    return extract_text_from_pdf(content, max_chars=MAX_CHARS + 1, max_pages=PDF_MAX_PAGES, timeout=PDF_TIMEOUT)
+
+
+def _text_from_eml(content: bytes) -> str:
+    msg = BytesParser(policy=policy.default).parsebytes(content)
+    parts = []
+    subject = msg.get("subject")
+    if subject:
+        parts.append(str(subject))
+
+    body = msg.get_body(preferencelist=("plain", "html"))
+    if body is not None:
+        parts.append(body.get_content())
+    else:
+        # Sem corpo de texto: usa o primeiro PDF anexado, como no upload da API
+        for attachment in msg.iter_attachments():
+            if attachment.get_content_type() == "application/pdf":
+                parts.append(_text_from_pdf(attachment.get_payload(decode=True) or b""))
+                break
+    return "\n".join(p for p in parts if p)
+
+
+def _extract_text(kind: str, content) -> str:
+    if kind == "text":
+        return content
+    if kind == "eml":
+        data = content if isinstance(content, bytes) else _read_file(content, FILE_MAX_BYTES)
+        return _text_from_eml(data)
+    if kind == "txt":
+        return _read_file(content, MAX_RAW_CHARS * 4).decode("utf-8", errors="replace")
+    if kind == "pdf":
+        return _text_from_pdf(_read_file(content, FILE_MAX_BYTES))
+    raise ValueError(f"Tipo de entrada desconhecido: {kind}")
+
+
+def classify_item(item: Item) -> Dict:
+    item_id, kind, content = item
+    try:
+        text = sanitize_email_text(_extract_text(kind, content)[:MAX_RAW_CHARS])[:MAX_CHARS]
+        if len(text.strip()) < MIN_CHARS:
+            return {"id": item_id, "sucesso": False, "error": "Email muito curto. Forneça pelo menos 10 caracteres."}
+        result = _classifier.classify(text)
+    except Exception as e:
+        logger.warning("Falha ao classificar %s: %s", item_id, e)
+        return {"id": item_id, "sucesso": False, "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "id": item_id,
+        "sucesso": True,
+        "categoria": result.get("categoria"),
+        "confianca": result.get("confianca"),
+        "metodo": result.get("metodo"),
+    }
+
+
+def classify_chunk(items) -> list:
+    # Vários emails por tarefa diluem o custo de IPC quando cada classificação leva microssegundos
+    return [classify_item(item) for item in items]
+
+
+# Saída incremental; o próprio arquivo de saída serve de checkpoint para --resume
+
+class ResultWriter:
+    def __init__(self, path: str, fmt: str, append: bool, flush_every: int = 100):
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self._pending = 0
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            _drop_partial_line(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if not exists:
+                self._csv.writeheader()
+
+    def write(self, record: Dict):
+        if self.fmt == "csv":
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def _drop_partial_line(path: str, block: int = 4096):
+    # Uma execução interrompida pode ter deixado a última linha pela metade: corta até o último \n
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            data = f.read(pos - start)
+            i = data.rfind(b"\n")
+            if i >= 0:
+                f.truncate(start + i + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def load_done_ids(path: str, fmt: str) -> Set[str]:
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                # Linha truncada no fim do arquivo não tem todas as colunas: processa de novo
+                if row.get("id") and None not in row.values() and row.get("sucesso"):
+                    done.add(row["id"])
+        else:
+            for line in f:
+                try:
+                    done.add(str(json.loads(line)["id"]))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+    return done
+
+
+
+def run(args) -> Dict:
+    fmt = args.format or ("csv" if args.out.endswith(".csv") else "jsonl")
+    done = load_done_ids(args.out, fmt) if args.resume else set()
+    if done:
+        logger.info("Retomando: %d emails já processados em %s", len(done), args.out)
+
+    ctx = multiprocessing.get_context("spawn")
+    rate_gate = SharedRateGate(args.rate, ctx) if args.rate and not args.offline else None
+    workers = args.workers or os.cpu_count() or 1
+    # Com o Gemini cada email espera a rede, então vale um por tarefa; offline, blocos maiores
+    chunk_size = args.chunk_size or (32 if args.offline else 1)
+    # Fila limitada: nunca há mais que max_pending blocos lidos e ainda não escritos
+    max_pending = args.max_pending or workers * 4
+
+    writer = ResultWriter(args.out, fmt, append=args.resume)
+    stats = Counter()
+    metodos = Counter()
+    start = time.perf_counter()
+
+    def collect(futures):
+        for future in futures:
+            for record in future.result():
+                writer.write(record)
+                stats["ok" if record["sucesso"] else "errors"] += 1
+                if record["sucesso"]:
+                    metodos[record["metodo"]] += 1
+                processed = stats["ok"] + stats["errors"]
+                if processed % args.progress_every == 0:
+                    logger.info("%d emails processados (%.1f emails/s)", processed, processed / (time.perf_counter() - start))
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(args.offline, rate_gate, logging.INFO if args.verbose else logging.WARNING),
+        ) as pool:
+            pending = set()
+            chunk = []
+            for item in iter_items(args.inputs):
+                if item[0] in done:
+                    stats["skipped"] += 1
+                    continue
+                chunk.append(item)
+                if len(chunk) < chunk_size:
+                    continue
+                pending.add(pool.submit(classify_chunk, chunk))
+                chunk = []
+                if len(pending) >= max_pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            if chunk:
+                pending.add(pool.submit(classify_chunk, chunk))
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    processed = stats["ok"] + stats["errors"]
+    return {
+        "processados": processed,
+        "sucesso": stats["ok"],
+        "erros": stats["errors"],
+        "pulados": stats["skipped"],
+        "segundos": round(elapsed, 2),
+        "emails_por_segundo": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "metodos": dict(metodos),
+        "workers": workers,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classificação de emails em lote (offline)")
+    parser.add_argument("inputs", nargs="+", help="Arquivos mbox, diretórios com .eml/.txt/.pdf ou JSONL")
+    parser.add_argument("--out", required=True, help="Arquivo de saída (.jsonl ou .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Formato da saída (padrão: pela extensão)")
+    parser.add_argument("--resume", action="store_true", help="Pula os ids que já estão no arquivo de saída")
+    parser.add_argument("--workers", type=int, default=0, help="Processos (padrão: número de CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Emails por tarefa (padrão: 1, ou 32 com --offline)")
+    parser.add_argument("--max-pending", type=int, default=0, help="Tarefas em voo no máximo (padrão: 4 por worker)")
+    parser.add_argument("--rate", type=float, default=float(os.getenv("BULK_GEMINI_RATE", "5")),
+                        help="Máximo de chamadas ao Gemini por segundo, somando todos os workers (0 = sem teto)")
+    parser.add_argument("--offline", action="store_true", help="Sem Gemini: só cache, modelo local e keywords")
+    parser.add_argument("--progress-every", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="Logs INFO também dos workers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(args)
+    print(
+        f"{report['processados']} emails em {report['segundos']}s: {report['emails_por_segundo']} emails/s "
+        f"({report['erros']} erros, {report['pulados']} pulados, {report['workers']} workers)",
+        file=sys.stderr,
+    )
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import json
+import re
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+
+def make_cache_key(email_text: str, model_name: str, prompt_version: str) -> str:
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(prompt_version.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(email_text.encode("utf-8", errors="replace"))
+    return h.hexdigest()
+
+
+class ClassificationCache:
+    # Cache LRU em memória com TTL e, opcionalmente, um backend SQLite no disco
+    # para manter entradas entre reinícios e compartilhar entre workers do mesmo host.
+    # Cada cache tem a sua tabela (table): clear() e o limite de tamanho no disco valem só para ela.
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, db_path: Optional[str] = None,
+                 table: str = "classification_cache"):
+        if not re.fullmatch(r"[a-z_]+", table):
+            raise ValueError(f"Nome de tabela inválido: {table}")
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.db_path = db_path
+        self.table = table
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._sets_since_purge = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if db_path:
+            schema = (f"CREATE TABLE IF NOT EXISTS {table} ("
+                      "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)",)
+            store = SQLiteStore(db_path, schema, f"Cache {table}", after_fork=self._reset_after_fork)
+            self._db = store if store.available else None
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ClassificationCache":
+        return cls(
+            max_entries=int(os.getenv("CLASSIFY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("CLASSIFY_CACHE_TTL", "3600")),
+            db_path=os.getenv("CLASSIFY_CACHE_PATH") or None,
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self._memory_get(key)
+        if value is not None or self._db is None:
+            return value
+        return self._disk_lookup(key)
+
+    async def get_async(self, key: str) -> Optional[Dict]:
+        # Para o event loop: acerto em memória na hora; a consulta ao disco vai para uma thread
+        value = self._memory_get(key)
+        if value is not None or self._db is None:
+            return value
+        return await asyncio.to_thread(self._disk_lookup, key)
+
+    def _memory_get(self, key: str) -> Optional[Dict]:
+        # Conta o miss só sem disco; com disco quem conta é _disk_lookup
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+            if self._db is None:
+                self.misses += 1
+            return None
+
+    def _disk_lookup(self, key: str) -> Optional[Dict]:
+        # A leitura no SQLite acontece fora do lock do LRU
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._store(key, value, time.monotonic())
+            self.hits += 1
+            self.disk_hits += 1
+            return dict(value)
+
+    def set(self, key: str, value: Dict):
+        now = time.monotonic()
+        with self._lock:
+            self._store(key, dict(value), now)
+            self._disk_set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                try:
+                    # Síncrono e depois das gravações pendentes, para nada voltar ao disco após o clear
+                    self._db.flush()
+                    self._db.write([(f"DELETE FROM {self.table}", ())])
+                except Exception as e:
+                    logger.warning("Falha ao limpar cache SQLite: %s", e)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self._db is not None,
+                **(self._db.stats() if self._db is not None else {}),
+            }
+
+    def _store(self, key: str, value: Dict, now: float):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: str) -> Optional[Dict]:
+        if self._db is None:
+            return None
+        try:
+            rows = self._db.query(
+                f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            return json.loads(rows[0][0]) if rows else None
+        except Exception as e:
+            logger.warning("Falha ao ler cache SQLite: %s", e)
+            return None
+
+    def _disk_set(self, key: str, value: Dict):
+        if self._db is None:
+            return
+        statements = [(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl),
+        )]
+        self._sets_since_purge += 1
+        if self._sets_since_purge >= 256:
+            # Limpeza periódica no disco: entradas expiradas e, além de max_entries, as que vencem primeiro
+            statements.append((f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)))
+            statements.append((
+                f"DELETE FROM {self.table} WHERE key NOT IN ("
+                f"SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT ?)",
+                (self.max_entries,),
+            ))
+            self._sets_since_purge = 0
+        self._db.submit(statements)
@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.logs import REQUEST_ID
+from app.metrics import ERRORS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# handler(payload, meta, progress) -> resultado JSON; progress(concluidos, total) atualiza o job
+Handler = Callable[[bytes, Dict, Callable[[int, int], None]], Awaitable[Dict]]
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    "id TEXT PRIMARY KEY, kind TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, "
+    "dedup_key TEXT, meta TEXT NOT NULL, payload BLOB, result TEXT, error TEXT, error_status INTEGER, "
+    "done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+    "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL, expires_at REAL)",
+    "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)",
+    "CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key)",
+    "CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)",
+)
+
+# Espera de um worker depois de um erro do SQLite (arquivo travado por outro processo, disco cheio), dobrando até o teto
+ERROR_BACKOFF = 0.5
+MAX_ERROR_BACKOFF = 30.0
+
+_STATUS_COLUMNS = (
+    "id, kind, priority, status, error, error_status, done, total, attempts, "
+    "created_at, started_at, finished_at, expires_at"
+)
+
+
+class JobFailed(Exception):
+    # Falha esperada (entrada inválida, PDF sem texto): vira o erro do job com o status HTTP indicado
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class JobQueue:
+    # Fila persistente em SQLite para trabalhos pesados (PDFs grandes, lotes) fora do ciclo request/response.
+    # O HTTP só grava o job e responde; threads de worker, cada uma com seu event loop, tiram os jobs
+    # por prioridade e executam os handlers registrados. Submissões idênticas reaproveitam o mesmo job,
+    # resultados expiram após `retention` e jobs de um worker que morreu voltam para a fila quando o
+    # lease vence. Vários processos (pre-fork) podem compartilhar o mesmo arquivo.
+
+    def __init__(
+        self,
+        db_path: str,
+        handlers: Dict[str, Handler],
+        workers: int = 2,
+        retention: float = 24 * 3600,
+        lease: float = 300,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+    ):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.workers = max(0, int(workers))
+        self.retention = float(retention)
+        self.lease = float(lease)
+        self.max_attempts = max(1, int(max_attempts))
+        self.poll_interval = float(poll_interval)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._last_maintenance = 0.0
+
+        self.completed = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.db_errors = 0
+
+        self._db = self._connect()
+        with self._lock:
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+        logger.info("Fila de jobs em %s (%d workers)", db_path, self.workers)
+
+    @classmethod
+    def from_env(cls, handlers: Dict[str, Handler]) -> "JobQueue":
+        return cls(
+            db_path=os.getenv("JOBS_PATH", "jobs.db"),
+            handlers=handlers,
+            workers=int(os.getenv("JOBS_WORKERS", "2")),
+            retention=float(os.getenv("JOBS_RETENTION", str(24 * 3600))),
+            lease=float(os.getenv("JOBS_LEASE", "300")),
+            max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transações explícitas (BEGIN IMMEDIATE) para disputar jobs entre processos
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- API (threads do HTTP) ---
+
+    def submit(self, kind: str, payload: bytes, meta: Optional[Dict] = None, priority: int = 0) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        meta_json = json.dumps(meta or {}, ensure_ascii=False, sort_keys=True)
+        h = hashlib.sha256()
+        for part in (kind.encode(), meta_json.encode(), payload):
+            h.update(part)
+            h.update(b"\x00")
+        dedup_key = h.hexdigest()
+        now = time.time()
+
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute(
+                    "SELECT id, status, priority FROM jobs WHERE dedup_key = ? AND status != ? "
+                    "AND (expires_at IS NULL OR expires_at > ?) LIMIT 1",
+                    (dedup_key, FAILED, now),
+                ).fetchone()
+                if row is not None:
+                    job_id, status, current = row
+                    # Reenvio com prioridade maior promove o job que ainda está na fila
+                    if status == QUEUED and priority > current:
+                        self._db.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+                        current = priority
+                    self._db.execute("COMMIT")
+                    self.deduplicated += 1
+                    return {"id": job_id, "status": status, "priority": current, "deduplicated": True}
+
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, priority, status, dedup_key, meta, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, priority, QUEUED, dedup_key, meta_json, payload, now),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                _rollback(self._db)
+                raise
+
+        with self._wake:
+            self._wake.notify()
+        return {"id": job_id, "status": QUEUED, "priority": priority, "deduplicated": False}
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict]:
+        columns = _STATUS_COLUMNS + (", result" if with_result else "")
+        with self._lock:
+            row = self._db.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_STATUS_COLUMNS.split(", ") + (["result"] if with_result else []), row))
+        if job["expires_at"] is not None and job["expires_at"] <= time.time():
+            return None
+        if with_result:
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update(dict(rows))
+        alive = sum(t.is_alive() for t in self._threads)
+        return {
+            "path": self.db_path,
+            "workers": self.workers,
+            "workers_alive": alive,
+            # Threads iniciadas que terminaram sem stop(): jobs aceitos podem não ser executados
+            "workers_dead": len(self._threads) - alive if not self._stopping.is_set() else 0,
+            "db_errors": self.db_errors,
+            "jobs": counts,
+            "completed": self.completed,
+            "failed": self.failed,
+            "deduplicated": self.deduplicated,
+        }
+
+    # --- Workers ---
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"jobs-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10):
+        # Jobs em andamento que não terminarem a tempo voltam para a fila quando o lease vencer
+        self._stopping.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _worker(self):
+        loop = asyncio.new_event_loop()
+        db = None
+        backoff = ERROR_BACKOFF
+        try:
+            while not self._stopping.is_set():
+                # Erro do SQLite (database is locked com vários processos, disco cheio) não mata o worker:
+                # espera e tenta de novo. Um job que não chegou a ser finalizado volta à fila pelo lease.
+                try:
+                    if db is None:
+                        db = self._connect()
+                    self._maintenance(db)
+                    job = self._claim(db)
+                    if job is None:
+                        # Acorda na hora com submissões deste processo; as de outros processos chegam pelo polling
+                        with self._wake:
+                            self._wake.wait(self.poll_interval)
+                    else:
+                        self._run(db, loop, job)
+                    backoff = ERROR_BACKOFF
+                except sqlite3.Error as e:
+                    with self._lock:
+                        self.db_errors += 1
+                    ERRORS.inc("job_queue", type(e).__name__)
+                    logger.warning("Erro do SQLite no worker de jobs: %s. Nova tentativa em %.1fs.", e, backoff)
+                    self._stopping.wait(backoff)
+                    backoff = min(backoff * 2, MAX_ERROR_BACKOFF)
+        except Exception:
+            logger.exception("Worker de jobs encerrado por erro inesperado")
+            raise
+        finally:
+            loop.close()
+            if db is not None:
+                db.close()
+
+    def _claim(self, db: sqlite3.Connection) -> Optional[Dict]:
+        now = time.time()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id, kind, meta, payload FROM jobs WHERE status = ? "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, now, now + self.lease, row[0]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            _rollback(db)
+            raise
+        if row is None:
+            return None
+        return {"id": row[0], "kind": row[1], "meta": json.loads(row[2]), "payload": row[3]}
+
+    def _run(self, db: sqlite3.Connection, loop: asyncio.AbstractEventLoop, job: Dict):
+        job_id, kind = job["id"], job["kind"]
+
+        def progress(done: int, total: int):
+            # Cada atualização também renova o lease do job; sem conseguir gravar, o job segue assim mesmo
+            try:
+                db.execute(
+                    "UPDATE jobs SET done = ?, total = ?, lease_until = ? WHERE id = ? AND status = ?",
+                    (done, total, time.time() + self.lease, job_id, RUNNING),
+                )
+            except sqlite3.Error as e:
+                logger.warning("Falha ao gravar o progresso do job %s: %s", job_id, e)
+
+        # O id do job faz o papel do id da requisição nos logs (as tasks do loop herdam o contexto)
+        token = REQUEST_ID.set(f"job-{job_id}")
+        try:
+            self._execute(db, loop, job, progress)
+        finally:
+            REQUEST_ID.reset(token)
+
+    def _execute(self, db: sqlite3.Connection, loop: asyncio.AbstractEventLoop, job: Dict, progress):
+        job_id, kind = job["id"], job["kind"]
+        logger.info("Job %s (%s) iniciado", job_id, kind)
+        try:
+            with STAGE_SECONDS.time(f"job_{kind}"):
+                result = loop.run_until_complete(self.handlers[kind](job["payload"], job["meta"], progress))
+        except JobFailed as e:
+            self._finish(db, job_id, FAILED, error=str(e), error_status=e.status_code)
+            logger.info("Job %s falhou: %s", job_id, e)
+            return
+        except Exception as e:
+            ERRORS.inc("job", type(e).__name__)
+            logger.exception("Erro no job %s: %s", job_id, e)
+            self._finish(db, job_id, FAILED, error="Erro ao processar o job.", error_status=500)
+            return
+        self._finish(db, job_id, DONE, result=result)
+        logger.info("Job %s concluído", job_id)
+
+    def _finish(self, db, job_id, status, result=None, error=None, error_status=None, attempts: int = 3):
+        now = time.time()
+        result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+        # Algumas tentativas antes de desistir: sem gravar, o resultado se perde e o job roda de novo após o lease
+        for attempt in range(attempts):
+            try:
+                # O payload (PDF, lote) não é mais necessário: só o resultado fica até expirar
+                db.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, error_status = ?, payload = NULL, "
+                    "finished_at = ?, expires_at = ?, lease_until = NULL WHERE id = ?",
+                    (status, result_json, error, error_status, now, now + self.retention, job_id),
+                )
+                break
+            except sqlite3.Error as e:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning("Falha ao finalizar o job %s: %s. Tentando de novo.", job_id, e)
+                self._stopping.wait(ERROR_BACKOFF * 2 ** attempt)
+        with self._lock:
+            if status == DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _maintenance(self, db: sqlite3.Connection):
+        # A cada 30s: remove resultados expirados e devolve à fila jobs com lease vencido
+        now = time.time()
+        if now - self._last_maintenance < 30:
+            return
+        self._last_maintenance = now
+        try:
+            expired = db.execute("DELETE FROM jobs WHERE expires_at <= ?", (now,)).rowcount
+            abandoned = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, error_status = 500, payload = NULL, finished_at = ?, "
+                "expires_at = ?, lease_until = NULL WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Job interrompido repetidamente.", now, now + self.retention, RUNNING, now, self.max_attempts),
+            ).rowcount
+            requeued = db.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL WHERE status = ? AND lease_until < ?",
+                (QUEUED, RUNNING, now),
+            ).rowcount
+            if expired or requeued or abandoned:
+                logger.info("Jobs: %d expirados removidos, %d devolvidos à fila, %d abandonados",
+                            expired, requeued, abandoned)
+        except sqlite3.Error as e:
+            logger.warning("Falha na manutenção da fila de jobs: %s", e)
+
+
+def _rollback(db: sqlite3.Connection):
+    # Só há o que desfazer se o BEGIN chegou a abrir a transação; um ROLLBACK sem ela esconderia o erro original
+    if db.in_transaction:
+        db.execute("ROLLBACK")
@@ -0,0 +1,55 @@
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Tabela de bytes: letras/dígitos ASCII viram minúsculas, todo o resto vira espaço
+_FOLD_TABLE = bytes(
+    ord(chr(i).lower()) if chr(i).isascii() and chr(i).isalnum() else ord(" ")
+    for i in range(256)
+)
+
+
+def normalize_text(text: str) -> bytes:
+    # Minúsculas, sem acentos e sem pontuação: "Solicitação!" -> b"solicitacao "
+    # NFKD separa as letras dos acentos; o encode descarta os acentos (e qualquer outro não-ASCII)
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").translate(_FOLD_TABLE)
+
+
+class KeywordMatcher:
+    # Matcher de keywords por palavra inteira, montado uma vez no __init__ do classificador.
+    # O texto é normalizado e quebrado em palavras em uma só passada (tudo em C), e as keywords
+    # de uma palavra saem de uma interseção de conjuntos; as poucas expressões com várias palavras
+    # ("feliz natal") são buscadas com espaços nas bordas no mesmo texto normalizado.
+    # Assim "oi" não casa dentro de "foi", e "solicitacao" casa "solicitação".
+
+    def __init__(self, keywords_by_category: Dict[str, Iterable[str]], weights: Optional[Dict[str, float]] = None):
+        weights = weights or {}
+        self._terms: Dict[bytes, Tuple[str, str, float]] = {}
+
+        for categoria, keywords in keywords_by_category.items():
+            for kw in keywords:
+                key = b" ".join(normalize_text(kw).split())
+                if not key or key in self._terms:
+                    continue
+                self._terms[key] = (categoria, kw, weights.get(kw, 1))
+
+        self._words = set(key for key in self._terms if b" " not in key)
+        self._phrases = [b" " + key + b" " for key in self._terms if b" " in key]
+
+    def match(self, text: str) -> Tuple[Dict[str, List[str]], Dict[str, float]]:
+        # Retorna as keywords distintas encontradas e a soma dos pesos, ambas por categoria
+        found: Dict[str, List[str]] = {}
+        scores: Dict[str, float] = {}
+        if not text:
+            return found, scores
+
+        tokens = normalize_text(text).split()
+        hits = self._words.intersection(tokens)
+        if self._phrases:
+            padded = b" " + b" ".join(tokens) + b" "
+            hits.update(phrase[1:-1] for phrase in self._phrases if phrase in padded)
+
+        for key in sorted(hits):
+            categoria, kw, weight = self._terms[key]
+            found.setdefault(categoria, []).append(kw)
+            scores[categoria] = scores.get(categoria, 0) + weight
+        return found, scores
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# Classificador local (só NumPy): n-gramas de caracteres com hashing, TF-IDF e regressão logística.
+# Treino: python -m app.local_model train dados.jsonl --out models/local_model
+# Cada linha do JSONL: {"email_text": "...", "categoria": "Produtivo" | "Improdutivo"}
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.keywords import normalize_text
+
+logger = logging.getLogger(__name__)
+
+LABELS = ["Produtivo", "Improdutivo"]
+# 2: treino no texto condensado (condense_email), como o serviço pontua; artefatos da versão 1 precisam ser retreinados
+FORMAT_VERSION = 2
+_PRIME = np.uint64(1099511628211)
+
+
+class LocalModel:
+    # O artefato são dois arquivos: <path>.npy com uma matriz float32 (2, n_features) — linha 0 é o IDF,
+    # linha 1 os coeficientes — aberta com mmap, e <path>.json com os metadados (bias, n-gramas etc.)
+
+    def __init__(self, weights: np.ndarray, bias: float, ngram_range: Tuple[int, int], max_chars: int = 512):
+        self.idf = weights[0]
+        self.coef = weights[1]
+        self.bias = float(bias)
+        self.n_features = weights.shape[1]
+        self.ngram_range = tuple(ngram_range)
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+
+        self.confident = 0
+        self.deferred = 0
+
+    @classmethod
+    def load(cls, path: str) -> "LocalModel":
+        path = str(path)
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Versão de modelo local não suportada: {meta.get('format_version')}")
+        weights = np.load(path + ".npy", mmap_mode="r")
+        return cls(weights, meta["bias"], meta["ngram_range"], meta.get("max_chars", 512))
+
+    def save(self, path: str, extra: Optional[Dict] = None):
+        path = str(path)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.save(path + ".npy", np.vstack([self.idf, self.coef]).astype(np.float32))
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "bias": self.bias,
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "max_chars": self.max_chars,
+            "labels": LABELS,
+        }
+        meta.update(extra or {})
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        return hashed_ngrams(text[:self.max_chars], self.n_features, self.ngram_range)
+
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        return self.tfidf(*self.features(text))
+
+    def tfidf(self, idx: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # TF sublinear vezes IDF, normalizado em L2
+        if idx.size == 0:
+            return idx, counts.astype(np.float32)
+        vals = (1.0 + np.log(counts)) * self.idf[idx]
+        norm = np.sqrt(np.dot(vals, vals))
+        return idx, (vals / norm if norm else vals).astype(np.float32)
+
+    def predict_proba(self, text: str) -> float:
+        # Probabilidade de "Produtivo"
+        idx, vals = self.vectorize(text)
+        z = float(np.dot(vals, self.coef[idx])) + self.bias if idx.size else self.bias
+        return _sigmoid(z)
+
+    def predict(self, text: str, threshold: float) -> Optional[Dict]:
+        # Retorna o resultado só se a confiança passar do limiar; senão None (segue para o Gemini)
+        p = self.predict_proba(text)
+        confianca = max(p, 1 - p)
+        with self._lock:
+            if confianca < threshold:
+                self.deferred += 1
+                return None
+            self.confident += 1
+        categoria = "Produtivo" if p >= 0.5 else "Improdutivo"
+        return {
+            "categoria": categoria,
+            "confianca": round(confianca * 100, 2),
+            "labels": LABELS,
+            "scores": [round(p * 100, 2), round((1 - p) * 100, 2)],
+            "metodo": "local-model",
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.confident + self.deferred
+            return {
+                "loaded": True,
+                "n_features": self.n_features,
+                "confident": self.confident,
+                "deferred": self.deferred,
+                "local_rate": round(self.confident / total, 4) if total else 0.0,
+            }
+
+
+def _sigmoid(z: float) -> float:
+    return 1.0 / (1.0 + math.exp(-min(max(z, -35.0), 35.0)))
+
+
+def hashed_ngrams(text: str, n_features: int, ngram_range: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    # Hash polinomial de todos os n-gramas de caracteres, vetorizado; devolve (índices, contagens)
+    folded = b" " + b" ".join(normalize_text(text).split()) + b" "
+    data = np.frombuffer(folded, dtype=np.uint8).astype(np.uint64)
+    buckets = []
+    mask = np.uint64(n_features - 1)
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        windows = data.size - n + 1
+        if windows <= 0:
+            continue
+        h = np.full(windows, np.uint64(n), dtype=np.uint64)
+        for k in range(n):
+            h = h * _PRIME + data[k:k + windows]
+        h ^= h >> np.uint64(29)
+        buckets.append(h & mask)
+    if not buckets:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    idx, counts = np.unique(np.concatenate(buckets), return_counts=True)
+    return idx.astype(np.int64), counts
+
+
+def train(
+    texts: List[str],
+    labels: List[int],
+    n_features: int = 2 ** 18,
+    ngram_range: Tuple[int, int] = (3, 5),
+    epochs: int = 8,
+    learning_rate: float = 0.5,
+    l2: float = 1e-5,
+    seed: int = 42,
+) -> LocalModel:
+    # labels: 1 = Produtivo, 0 = Improdutivo. SGD com decaimento da taxa de aprendizado.
+    if n_features & (n_features - 1):
+        raise ValueError("n_features precisa ser potência de 2.")
+
+    # Mesmo corte de LocalModel.features, para treino e predição verem os mesmos n-gramas
+    max_chars = 512
+    feats = [hashed_ngrams(t[:max_chars], n_features, ngram_range) for t in texts]
+    df = np.zeros(n_features, dtype=np.float64)
+    for idx, _ in feats:
+        df[idx] += 1
+    idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+    weights = np.vstack([idf, np.zeros(n_features, dtype=np.float32)])
+    model = LocalModel(weights, 0.0, ngram_range, max_chars)
+    vectors = [model.tfidf(idx, counts) for idx, counts in feats]
+
+    coef = np.zeros(n_features, dtype=np.float64)
+    bias = 0.0
+    y = np.asarray(labels, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    step = 0
+    for epoch in range(epochs):
+        loss = 0.0
+        for i in rng.permutation(len(vectors)):
+            idx, vals = vectors[i]
+            lr = learning_rate / (1 + 1e-4 * step)
+            z = float(np.dot(vals, coef[idx])) + bias
+            p = _sigmoid(z)
+            g = p - y[i]
+            coef[idx] -= lr * (g * vals + l2 * coef[idx])
+            bias -= lr * g
+            loss -= math.log(max(p if y[i] else 1 - p, 1e-12))
+            step += 1
+        logger.info("Época %d/%d: perda média %.4f", epoch + 1, epochs, loss / max(1, len(vectors)))
+
+    model.coef = coef.astype(np.float32)
+    model.bias = bias
+    return model
+
+
+def load_jsonl(path: str, token_budget: int = 128) -> Tuple[List[str], List[int]]:
+    from app.preprocess import condense_email
+    from app.sanitizer import sanitize_email_text
+
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            text = row.get("email_text") or row.get("text") or ""
+            label = str(row.get("categoria") or row.get("label") or "").strip().title()
+            if label not in LABELS:
+                logger.warning("Linha %d ignorada: categoria inválida %r", lineno, label)
+                continue
+            # Mesmo pré-processamento do serviço (sanitize em main.py, condense em EmailClassifier._condense):
+            # o modelo local pontua o texto condensado, então é nele que treina e é avaliado
+            texts.append(condense_email(sanitize_email_text(text), token_budget))
+            labels.append(1 if label == "Produtivo" else 0)
+    return texts, labels
+
+
+def load_from_env() -> Optional[LocalModel]:
+    path = os.getenv("LOCAL_MODEL_PATH")
+    if not path:
+        return None
+    try:
+        model = LocalModel.load(path)
+        logger.info("Modelo local carregado de %s (%d features).", path, model.n_features)
+        return model
+    except FileNotFoundError:
+        logger.warning("Modelo local não encontrado em %s. Seguindo sem ele.", path)
+    except Exception as e:
+        logger.error("Falha ao carregar modelo local de %s: %s", path, e)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Treino do classificador local")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="Treina a partir de um JSONL rotulado")
+    p_train.add_argument("data", help="JSONL com email_text e categoria")
+    p_train.add_argument("--out", default="models/local_model", help="Caminho do artefato (sem extensão)")
+    p_train.add_argument("--features", type=int, default=18, help="log2 do número de features")
+    p_train.add_argument("--epochs", type=int, default=8)
+    p_train.add_argument("--holdout", type=float, default=0.1, help="Fração separada para avaliação")
+    p_train.add_argument("--token-budget", type=int, default=int(os.getenv("CLASSIFY_TOKEN_BUDGET", "128")),
+                         help="Orçamento do texto condensado (o CLASSIFY_TOKEN_BUDGET do serviço)")
+    p_train.add_argument("--threshold", type=float, default=0.9, help="Limiar para o relatório de cobertura")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    texts, labels = load_jsonl(args.data, args.token_budget)
+    if len(set(labels)) < 2:
+        print("Erro: o JSONL precisa ter exemplos das duas categorias.", file=sys.stderr)
+        return 1
+
+    order = np.random.default_rng(0).permutation(len(texts))
+    n_test = int(len(texts) * args.holdout)
+    test, fit = order[:n_test], order[n_test:]
+
+    start = time.perf_counter()
+    model = train([texts[i] for i in fit], [labels[i] for i in fit], n_features=2 ** args.features, epochs=args.epochs)
+    print(f"Treinado com {len(fit)} emails em {time.perf_counter() - start:.1f}s")
+
+    report = {"train_size": int(len(fit)), "test_size": int(n_test), "token_budget": args.token_budget}
+    if n_test:
+        probs = np.array([model.predict_proba(texts[i]) for i in test])
+        y = np.array([labels[i] for i in test])
+        conf = np.maximum(probs, 1 - probs)
+        confident = conf >= args.threshold
+        report["accuracy"] = round(float(np.mean((probs >= 0.5) == y)), 4)
+        report["coverage_at_threshold"] = round(float(np.mean(confident)), 4)
+        report["accuracy_at_threshold"] = (
+            round(float(np.mean((probs[confident] >= 0.5) == y[confident])), 4) if confident.any() else None
+        )
+        print(f"Acurácia (holdout): {report['accuracy']:.2%}")
+        print(f"Cobertura com limiar {args.threshold}: {report['coverage_at_threshold']:.2%} "
+              f"(acurácia nesses: {report['accuracy_at_threshold']})")
+
+    model.save(args.out, extra={"training": report})
+    print(f"Modelo salvo em {args.out}.npy / {args.out}.json")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Logs fora da thread da requisição: quem loga só filtra (nível, amostragem), resolve a mensagem e
+# enfileira; formatação JSON e escrita no stream ficam com a thread do QueueListener. A fila é
+# limitada e nunca bloqueia: cheia, o registro é descartado e contado.
+
+REQUEST_ID: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+_REQUEST_ID_HEADER = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+# Limite de tipos de mensagem com contador próprio na amostragem (templates são strings fixas)
+MAX_SAMPLED_TEMPLATES = 10000
+
+
+class JsonFormatter(logging.Formatter):
+    # Uma linha JSON por registro, com o id da requisição e a taxa de amostragem (para reponderar contagens)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        sample_rate = getattr(record, "sample_rate", 1.0)
+        if sample_rate < 1:
+            entry["sample_rate"] = sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    # Roda na thread de quem loga: copia o id da requisição do contexto para o registro
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # Amostragem por tipo de mensagem: o tipo é o logger + o template antes da formatação, então
+    # "Cache: %s (%s%%)" conta como um só tipo qualquer que seja a categoria. Mantém a 1ª de cada N
+    # ocorrências (N = 1/taxa), o que garante que todo tipo apareça. WARNING e acima nunca são descartados.
+    # rules: {padrão: taxa}; o padrão casa com o nome do logger ou com um trecho do template.
+
+    def __init__(self, default_rate: float = 1.0, rules: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rules = dict(rules or {})
+        self._rates: Dict[tuple, float] = {}
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "SamplingFilter":
+        # LOG_SAMPLE_RULES="Chamando Gemini=0;Cache:=0.1;uvicorn.access=0.01"
+        rules = {}
+        for part in os.getenv("LOG_SAMPLE_RULES", "").split(";"):
+            pattern, _, rate = part.rpartition("=")
+            if pattern.strip():
+                try:
+                    rules[pattern.strip()] = float(rate)
+                except ValueError:
+                    pass
+        return cls(float(os.getenv("LOG_SAMPLE_RATE", "1")), rules)
+
+    def _rate_for(self, key: tuple) -> float:
+        name, template = key
+        for pattern, rate in self.rules.items():
+            if pattern == name or pattern in template:
+                return rate
+        return self.default_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        rate = self._rates.get(key)
+        if rate is None:
+            rate = self._rate_for(key)
+            if len(self._rates) < MAX_SAMPLED_TEMPLATES:
+                self._rates[key] = rate
+        if rate >= 1:
+            return True
+
+        if rate <= 0:
+            self.dropped += 1
+            return False
+        every = max(1, round(1 / rate))
+        with self._lock:
+            seen = self._counts.get(key, 0)
+            if seen or len(self._counts) < MAX_SAMPLED_TEMPLATES:
+                self._counts[key] = (seen + 1) % every
+            if seen:
+                self.dropped += 1
+                return False
+        record.sample_rate = rate
+        return True
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Enfileira sem esperar: com a fila cheia (stream lento, pico de logs) o registro é descartado
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só resolve os args (objetos mutáveis podem mudar depois) e o traceback; o JSON é montado no listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestIdMiddleware:
+    # Middleware ASGI: cada requisição recebe um id (o X-Request-ID enviado, se válido, ou um novo),
+    # visível em todos os logs dela e devolvido no header da resposta
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_HEADER.fullmatch(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        token = REQUEST_ID.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            REQUEST_ID.reset(token)
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_sampling: Optional[SamplingFilter] = None
+_listener: Optional[QueueListener] = None
+_output: Optional[logging.Handler] = None
+_queue_size = 0
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.Queue(_queue_size)
+    _handler.queue = log_queue
+    _listener = QueueListener(log_queue, _output, respect_handler_level=False)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # A thread do listener não atravessa o fork (modo pre-fork): o filho cria fila e thread próprias
+    _sampling.reset_after_fork()
+    _start_listener()
+
+
+def configure_logging(level: Optional[str] = None):
+    # Idempotente: troca os handlers do root (basicConfig, uvicorn) pelo handler com fila
+    global _handler, _sampling, _output, _queue_size
+    if _handler is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    _queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    _output = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        _output.setFormatter(JsonFormatter())
+    else:
+        _output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    _sampling = SamplingFilter.from_env()
+    _handler = NonBlockingQueueHandler(queue.Queue(_queue_size))
+    # Amostragem primeiro: registro descartado não paga nem a leitura do contexto
+    _handler.addFilter(_sampling)
+    _handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    # Logs do uvicorn (inclusive o access log) passam pela mesma fila
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _start_listener()
+    atexit.register(stop_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    # Escreve o que ainda está na fila; chamar antes de os._exit
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict:
+    if _handler is None:
+        return {"enabled": False}
+    return {
+        "queued": _handler.queue.qsize(),
+        "queue_size": _queue_size,
+        "dropped_queue_full": _handler.dropped,
+        "sampled_out": _sampling.dropped,
+        "sample_rate": _sampling.default_rate,
+        "sample_rules": _sampling.rules,
+    }
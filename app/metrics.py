@@ -0,0 +1,152 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Métricas em memória no formato texto do Prometheus, sem dependências externas.
+# Registrar uma observação custa um perf_counter, um bisect e um incremento sob lock.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, values)} {count}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de labels: [contagem por bucket (+Inf no fim), soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total_sum, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    labels = _format_labels(self.label_names, values, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, values)} {total_sum}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, values)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], List[str]]):
+        # Coletores geram linhas na hora do scrape (ex.: estado do cache e do circuit breaker)
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, documentation: str, samples: Dict[str, float], label: str = "") -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for key, value in samples.items():
+        labels = f'{{{label}="{_escape(key)}"}}' if label else ""
+        lines.append(f"{name}{labels} {float(value)}")
+    return lines
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "email_classifier_stage_seconds",
+    "Duração de cada etapa do processamento de /classify",
+    labels=("stage",),
+))
+CLASSIFICATIONS = REGISTRY.register(Counter(
+    "email_classifier_classifications_total",
+    "Classificações concluídas por método",
+    labels=("metodo",),
+))
+ERRORS = REGISTRY.register(Counter(
+    "email_classifier_errors_total",
+    "Erros por etapa e classe de erro",
+    labels=("stage", "error"),
+))
+API_ATTEMPTS = REGISTRY.register(Counter(
+    "email_classifier_gemini_attempts_total",
+    "Tentativas de chamada ao Gemini por resultado",
+    labels=("outcome",),
+))
+API_RETRIES = REGISTRY.register(Counter(
+    "email_classifier_gemini_retries_total",
+    "Novas tentativas agendadas após erro do Gemini",
+))
+API_FAILOVERS = REGISTRY.register(Counter(
+    "email_classifier_gemini_failovers_total",
+    "Tentativas desviadas na hora para outra chave/modelo do pool após 429, 5xx ou timeout",
+))
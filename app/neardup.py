@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.keywords import normalize_text
+from app.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+BITS = 64
+MIN_SHINGLES = 8
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS neardup_index ("
+    "namespace TEXT NOT NULL, simhash INTEGER NOT NULL, value TEXT NOT NULL, "
+    "expires_at REAL NOT NULL, PRIMARY KEY (namespace, simhash))",
+)
+
+
+def shingles(text: str) -> Set[bytes]:
+    # Pares de palavras do texto normalizado. Tokens com dígitos (tickets, datas, valores) viram "0",
+    # então notificações que só mudam nesses campos geram os mesmos shingles.
+    words = [b"0" if any(48 <= c <= 57 for c in w) else w for w in normalize_text(text).split()]
+    return {a + b" " + b for a, b in zip(words, words[1:])}
+
+
+def simhash(features: Set[bytes]) -> int:
+    # Cada bit do fingerprint é o voto da maioria dos hashes dos shingles naquele bit.
+    # As colunas de bits saem de strings binárias transpostas com zip (contagem feita em C).
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(f, digest_size=8).digest(), "big"), "064b")
+        for f in features
+    ]
+    half = len(rows) / 2
+    return int("".join("1" if col.count("1") > half else "0" for col in zip(*rows)), 2)
+
+
+def similarity(a: int, b: int) -> float:
+    return 1.0 - (a ^ b).bit_count() / BITS
+
+
+def _band_ranges(max_distance: int) -> List[Tuple[int, int]]:
+    # Com max_distance + 1 faixas, dois fingerprints a até max_distance bits de distância
+    # coincidem em pelo menos uma faixa inteira (casa dos pombos): a busca não perde candidatos.
+    bands = max(1, min(max_distance + 1, BITS // 4))
+    size, extra = divmod(BITS, bands)
+    ranges = []
+    start = 0
+    for i in range(bands):
+        width = size + (1 if i < extra else 0)
+        ranges.append((start, (1 << width) - 1))
+        start += width
+    return ranges
+
+
+def _to_signed(h: int) -> int:
+    return h - (1 << BITS) if h >= 1 << (BITS - 1) else h
+
+
+class NearDuplicateIndex:
+    # Índice SimHash de emails já classificados pela IA: um email a até `threshold` de similaridade
+    # (1 - bits diferentes / 64) de um conhecido reaproveita a classificação sem chamar a API.
+    # LRU em memória com TTL e, opcionalmente, persistência em SQLite.
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        max_entries: int = 10000,
+        ttl: float = 7 * 24 * 3600,
+        db_path: Optional[str] = None,
+        namespace: str = "",
+    ):
+        self.threshold = threshold
+        self.max_distance = int((1 - threshold) * BITS + 1e-9)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.db_path = db_path
+        self.namespace = namespace
+        self._ranges = _band_ranges(self.max_distance)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._bands: List[Dict[int, Set[int]]] = [{} for _ in self._ranges]
+        self._lock = threading.Lock()
+        self._db = None
+        self._adds_since_prune = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            store = SQLiteStore(db_path, _SCHEMA, "Índice de quase-duplicatas", after_fork=self._reset_after_fork)
+            self._db = store if store.available else None
+            self._load()
+
+    @classmethod
+    def from_env(cls, namespace: str = "") -> Optional["NearDuplicateIndex"]:
+        threshold = float(os.getenv("NEARDUP_THRESHOLD", "0.85"))
+        if threshold <= 0:
+            return None
+        return cls(
+            threshold=min(threshold, 1.0),
+            max_entries=int(os.getenv("NEARDUP_SIZE", "10000")),
+            ttl=float(os.getenv("NEARDUP_TTL", str(7 * 24 * 3600))),
+            db_path=os.getenv("NEARDUP_PATH") or None,
+            namespace=namespace,
+        )
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        features = shingles(text)
+        # Textos muito curtos têm poucos shingles e fingerprints instáveis: ficam de fora
+        if len(features) < MIN_SHINGLES:
+            return None
+        return simhash(features)
+
+    def lookup(self, text: str) -> Optional[Tuple[Dict, float]]:
+        h = self.fingerprint(text)
+        if h is None:
+            return None
+        now = time.time()
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for (start, mask), buckets in zip(self._ranges, self._bands):
+                for candidate in buckets.get((h >> start) & mask, ()):
+                    distance = (h ^ candidate).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is not None:
+                value, expires_at = self._entries[best]
+                if expires_at > now:
+                    self._entries.move_to_end(best)
+                    self.hits += 1
+                    return dict(value), 1.0 - best_distance / BITS
+                self._remove(best)
+            self.misses += 1
+        return None
+
+    def add(self, text: str, value: Dict):
+        h = self.fingerprint(text)
+        if h is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(h, value, expires_at)
+        if self._db is not None:
+            self._disk_set(h, value, expires_at)
+
+    def _store(self, h: int, value: Dict, expires_at: float):
+        if h in self._entries:
+            self._entries.move_to_end(h)
+        else:
+            for (start, mask), buckets in zip(self._ranges, self._bands):
+                buckets.setdefault((h >> start) & mask, set()).add(h)
+        self._entries[h] = (dict(value), expires_at)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, h: int):
+        self._entries.pop(h, None)
+        for (start, mask), buckets in zip(self._ranges, self._bands):
+            key = (h >> start) & mask
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(h)
+                if not bucket:
+                    del buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands = [{} for _ in self._ranges]
+            if self._db is not None:
+                self._db.flush()
+                self._db.write([("DELETE FROM neardup_index WHERE namespace = ?", (self.namespace,))])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "bands": len(self._ranges),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self._db is not None,
+                **(self._db.stats() if self._db is not None else {}),
+            }
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._db is None:
+            return
+        try:
+            rows = self._db.query(
+                "SELECT simhash, value, expires_at FROM neardup_index "
+                "WHERE namespace = ? AND expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+                (self.namespace, time.time(), self.max_entries),
+            )
+        except Exception as e:
+            logger.warning("Falha ao carregar índice de quase-duplicatas: %s", e)
+            return
+        with self._lock:
+            # Do mais antigo para o mais novo, para a ordem LRU refletir a validade
+            for h, value, expires_at in reversed(rows):
+                self._store(h % (1 << BITS), json.loads(value), expires_at)
+        logger.info("Índice de quase-duplicatas: %d entradas carregadas do disco", len(rows))
+
+    def _disk_set(self, h: int, value: Dict, expires_at: float):
+        statements = [(
+            "INSERT OR REPLACE INTO neardup_index (namespace, simhash, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, _to_signed(h), json.dumps(value, ensure_ascii=False), expires_at),
+        )]
+        with self._lock:
+            self._adds_since_prune += 1
+            prune = self._adds_since_prune >= 1000
+            if prune:
+                self._adds_since_prune = 0
+        if prune:
+            statements.append(("DELETE FROM neardup_index WHERE expires_at <= ?", (time.time(),)))
+            statements.append((
+                "DELETE FROM neardup_index WHERE namespace = ? AND simhash NOT IN ("
+                "SELECT simhash FROM neardup_index WHERE namespace = ? ORDER BY expires_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            ))
+        self._db.submit(statements)
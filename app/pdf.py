@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", str(PDF_WORKERS * 2)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "10"))
+
+
+class PdfTextTooLong(ValueError):
+    # O texto do PDF passou de max_chars (com truncate=False): o PDF é recusado, não cortado
+    def __init__(self, max_chars: int):
+        super().__init__(f"Texto do PDF com mais de {max_chars} caracteres.")
+        self.max_chars = max_chars
+
+    def __reduce__(self):
+        # Atravessa o ProcessPoolExecutor com o argumento original
+        return PdfTextTooLong, (self.max_chars,)
+
+
+def extract_text_from_pdf(
+    pdf_content: bytes,
+    max_chars: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    timeout: Optional[float] = None,
+    truncate: bool = True,
+) -> str:
+    # Para assim que passar de max_chars caracteres, depois de max_pages páginas ou ao estourar o timeout;
+    # nesses casos devolve o que já foi extraído. Com truncate=False, passar de max_chars levanta
+    # PdfTextTooLong em vez de devolver o texto cortado
+    # Import aqui: roda nos processos do pool, e o processo do servidor não precisa pagar por ele
+    import PyPDF2
+
+    deadline = time.monotonic() + timeout if timeout else None
+
+    try:
+        pdf_file = BytesIO(pdf_content)
+        reader = PyPDF2.PdfReader(pdf_file)
+
+        if len(reader.pages) == 0:
+            logger.warning("PDF sem páginas.")
+            return ""
+
+        parts = []
+        total = 0
+        exceeded = False
+        for i, page in enumerate(reader.pages):
+            if max_pages is not None and i >= max_pages:
+                logger.info("Limite de %d páginas atingido; ignorando o restante do PDF.", max_pages)
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning("Tempo limite de %ss atingido na página %d do PDF.", timeout, i + 1)
+                break
+            try:
+                page_text = page.extract_text()
+                if page_text:
+                    parts.append(page_text)
+                    total += len(page_text) + 1
+                logger.debug("Página %d processada", i + 1)
+            except Exception as e:
+                logger.warning("Erro ao processar página %d: %s", i + 1, e)
+                continue
+            if max_chars is not None and total > max_chars + 1:
+                logger.debug("Orçamento de %d caracteres ultrapassado na página %d", max_chars, i + 1)
+                exceeded = True
+                break
+
+        text = "\n".join(parts).strip()
+        exceeded = exceeded or (max_chars is not None and len(text) > max_chars)
+    except Exception as e:
+        logger.exception("Erro ao extrair texto do PDF: %s", e)
+        return ""
+
+    if exceeded:
+        if not truncate:
+            raise PdfTextTooLong(max_chars)
+        return text[:max_chars]
+    return text
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Um semáforo por event loop: os workers de /jobs rodam em loops próprios, fora do loop do uvicorn
+_pending = weakref.WeakKeyDictionary()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o processo principal tem threads (uvicorn, carregamento do modelo) e fork não é seguro
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            logger.info("Pool de extração de PDF iniciado com %d processos.", PDF_WORKERS)
+        return _pool
+
+
+def _reset_pool(terminate: bool = False, wait: bool = False):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if terminate:
+                # Um worker travado numa página não responde ao shutdown; encerra os processos na força
+                for process in list(getattr(_pool, "_processes", {}).values()):
+                    process.terminate()
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def shutdown_pool():
+    # No desligamento espera os workers saírem; sem isso o hook de saída do concurrent.futures
+    # ainda tenta acordar a thread de gerenciamento e falha com "Bad file descriptor"
+    _reset_pool(wait=True)
+
+
+async def extract_text_from_pdf_async(pdf_content: bytes, max_chars: Optional[int] = None) -> str:
+    # Roda a extração em um processo do pool, sem bloquear o event loop.
+    # O semáforo limita quantos PDFs ficam na fila do pool ao mesmo tempo.
+    # Texto acima de max_chars levanta PdfTextTooLong: quem chama recusa o PDF.
+    loop = asyncio.get_running_loop()
+    pending = _pending.get(loop)
+    if pending is None:
+        pending = _pending[loop] = asyncio.Semaphore(PDF_MAX_PENDING)
+
+    async with pending:
+        try:
+            future = loop.run_in_executor(
+                _get_pool(), extract_text_from_pdf, pdf_content, max_chars, PDF_MAX_PAGES, PDF_TIMEOUT, False
+            )
+            # Margem sobre o timeout cooperativo: só dispara se uma única página travar o worker
+            return await asyncio.wait_for(future, timeout=PDF_TIMEOUT + 5)
+        except asyncio.TimeoutError:
+            logger.error("Extração de PDF excedeu %ss; reiniciando o pool.", PDF_TIMEOUT + 5)
+            _reset_pool(terminate=True)
+            return ""
+        except BrokenProcessPool:
+            logger.error("Pool de extração de PDF quebrado; reiniciando.")
+            _reset_pool()
+            return ""
@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.resilience import AdaptiveLimiter, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada nova amostra na média móvel da latência (e da taxa de falhas)
+LATENCY_ALPHA = 0.2
+# Custo estimado de uma tentativa perdida (resposta de erro + failover), somado ao score na proporção da taxa de falhas
+FAILURE_PENALTY = 1.0
+# Depois de um 429 sem Retry-After o endpoint vai para o fim da fila de candidatos por esse tempo (s)
+THROTTLE_COOLDOWN = float(os.getenv("GEMINI_THROTTLE_COOLDOWN", "5"))
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def api_keys_from_env() -> List[str]:
+    # GOOGLE_API_KEYS="k1,k2" ou, como antes, uma só GOOGLE_API_KEY
+    return _split(os.getenv("GOOGLE_API_KEYS")) or _split(os.getenv("GOOGLE_API_KEY"))
+
+
+def models_from_env() -> List[str]:
+    # GEMINI_MODELS="gemini-2.5-flash-lite,gemini-2.5-flash" em ordem de preferência, ou GEMINI_MODEL
+    return _split(os.getenv("GEMINI_MODELS")) or [os.getenv("GEMINI_MODEL", "gemini-2.5-flash")]
+
+
+class Endpoint:
+    # Uma chave de API + um modelo. A cota do Gemini é por chave e modelo, então cada par tem
+    # limitador, circuit breaker e latência observada próprios; o client (chave de API) é compartilhado.
+
+    def __init__(self, key_id: str, model: str, client, rank: int, breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+        self.key_id = key_id
+        self.model = model
+        self.client = client
+        self.rank = rank
+        self.breaker = breaker
+        self.limiter = limiter
+        self.latency: Optional[float] = None
+        self.failure_rate: Optional[float] = None
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.key_id}/{self.model}"
+
+    def score(self) -> float:
+        # Latência esperada: média observada inflada pela fração ocupada do limite (cota restante), mais
+        # o custo das tentativas que falham. Sem amostras vale 0: cada endpoint novo recebe ao menos uma
+        # chamada antes de ser comparado. 429 e 5xx não dão latência, mas entram na taxa de falhas.
+        latency = self.latency or 0.0
+        return (latency * (1 + self.limiter.in_flight / max(1, self.limiter.limit))
+                + (self.failure_rate or 0.0) * FAILURE_PENALTY)
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self._cooldown_until
+
+    def available(self) -> bool:
+        # Sem consumir a chamada de teste do half-open: descarta quem recusaria agora
+        return self.limiter.blocked_for() <= 0 and self.breaker.accepting()
+
+    def record_success(self, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.successes += 1
+            self._record_outcome(0.0)
+            self.latency = seconds if self.latency is None else (
+                LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * self.latency
+            )
+
+    def record_failure(self, seconds: Optional[float] = None, throttled: bool = False,
+                       retry_after: Optional[float] = None):
+        # seconds só para falhas que dizem algo da latência (timeout); 429 e 5xx respondem rápido.
+        # Um 429 sem Retry-After (o limitador não bloqueia o endpoint) põe o endpoint em cooldown.
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self._record_outcome(1.0)
+            if throttled:
+                self.throttled += 1
+                if not retry_after:
+                    self._cooldown_until = time.monotonic() + THROTTLE_COOLDOWN
+            if seconds is not None:
+                self.latency = seconds if self.latency is None else (
+                    LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * self.latency
+                )
+
+    def _record_outcome(self, failed: float):
+        self.failure_rate = failed if self.failure_rate is None else (
+            LATENCY_ALPHA * failed + (1 - LATENCY_ALPHA) * self.failure_rate
+        )
+
+    def stats(self) -> Dict:
+        limiter = self.limiter.stats()
+        cooling_down = self.cooling_down()
+        with self._lock:
+            return {
+                "endpoint": self.name,
+                "key": self.key_id,
+                "model": self.model,
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "throttled": self.throttled,
+                "failure_rate": round(self.failure_rate, 3) if self.failure_rate is not None else None,
+                "cooling_down": cooling_down,
+                "circuit_breaker": self.breaker.stats(),
+                "limiter": limiter,
+            }
+
+
+class ClientPool:
+    # Endpoints (chave x modelo) escolhidos a cada chamada pela menor latência esperada entre os que
+    # têm vaga no limitador, circuito fechado e nenhum Retry-After pendente. A ordem dos modelos é a
+    # preferência: desempata e define quem recebe as primeiras chamadas.
+
+    def __init__(self, keys: List[str], models: List[str], client_factory: Callable[[str], object]):
+        if not keys or not models:
+            raise ValueError("O pool precisa de ao menos uma chave e um modelo.")
+        self.models = list(models)
+        # Um client por chave, compartilhado pelos modelos. Ele não mantém conexões: o google-genai 1.4
+        # abre um httpx.AsyncClient novo a cada chamada async (sem opção para injetar um), então cada
+        # chamada paga conexão TCP + TLS
+        clients = [(f"key{i + 1}", client_factory(key)) for i, key in enumerate(keys)]
+        self.endpoints = [
+            Endpoint(
+                key_id, model, client, rank,
+                breaker=CircuitBreaker.from_env(name=f"Gemini {key_id}/{model}"),
+                limiter=AdaptiveLimiter.from_env(name=f"Gemini {key_id}/{model}"),
+            )
+            for rank, model in enumerate(self.models)
+            for key_id, client in clients
+        ]
+        self.failovers = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, client_factory: Callable[[str], object]) -> "ClientPool":
+        return cls(api_keys_from_env(), models_from_env(), client_factory)
+
+    def _candidates(self, exclude: Iterable[str]) -> List[Endpoint]:
+        exclude = set(exclude)
+        candidates = [ep for ep in self.endpoints if ep.name not in exclude and ep.available()]
+        # Em cooldown só depois de todos os outros: ainda serve se for o único com vaga
+        candidates.sort(key=lambda ep: (ep.cooling_down(), ep.score(), ep.rank))
+        return candidates
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[Endpoint]:
+        # Reserva uma vaga no melhor endpoint disponível; quem recebe deve chamar endpoint.limiter.release()
+        for endpoint in self._candidates(exclude):
+            if not endpoint.limiter.try_acquire():
+                continue
+            # Breaker depois do limitador: a chamada de teste do half-open só é consumida se houver vaga
+            if not endpoint.breaker.allow_request():
+                endpoint.limiter.release()
+                continue
+            return endpoint
+        return None
+
+    def has_candidates(self, exclude: Iterable[str] = ()) -> bool:
+        # Há endpoint fora de exclude sem Retry-After pendente nem circuito aberto (talvez só sem vaga agora)
+        return bool(self._candidates(exclude))
+
+    def same_model(self, model: str) -> List[str]:
+        return [ep.name for ep in self.endpoints if ep.model == model]
+
+    def record_failover(self):
+        with self._lock:
+            self.failovers += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict:
+        endpoints = [ep.stats() for ep in self.endpoints]
+        keys: Dict[str, Dict] = {}
+        models: Dict[str, Dict] = {}
+        for ep in endpoints:
+            for group, name in ((keys, ep["key"]), (models, ep["model"])):
+                agg = group.setdefault(name, {"calls": 0, "successes": 0, "failures": 0, "throttled": 0})
+                for field in agg:
+                    agg[field] += ep[field]
+        with self._lock:
+            return {
+                "models": self.models,
+                "failovers": self.failovers,
+                "rejected": self.rejected,
+                "per_key": keys,
+                "per_model": models,
+                "endpoints": endpoints,
+            }
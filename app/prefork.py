@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Servidor pre-fork: importa o app e monta o estado compartilhado (keywords, modelo local, imports
+# do SDK do Gemini) uma vez no processo pai e só então faz fork dos workers, que herdam tudo pronto
+# (copy-on-write) e ficam prontos em milissegundos. Só em sistemas com os.fork (Linux/macOS).
+#
+# Uso: python -m app.prefork --workers 4 [--host 0.0.0.0] [--port 8000]
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.logs import configure_logging, stop_logging
+from app.sqlite_store import flush_all
+
+logger = logging.getLogger("email-classifier.prefork")
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn_worker(config, sock) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    import uvicorn
+
+    from app.startup import STARTUP
+
+    STARTUP.reset_after_fork()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        flush_all()
+        stop_logging()
+        os._exit(0)
+
+
+def serve(workers: int, host: str, port: int, log_level: str = "info"):
+    import uvicorn
+
+    os.environ["PRELOAD_MODELS"] = "1"
+    start = time.perf_counter()
+    import main  # o import já chama main.preload()
+
+    logger.info("Estado compartilhado montado no processo pai em %.2fs", time.perf_counter() - start)
+
+    sock = _bind(host, port)
+    # log_config=None: o uvicorn mantém o handler com fila montado por app.logs
+    config = uvicorn.Config(main.app, log_level=log_level, log_config=None)
+    children = {_spawn_worker(config, sock) for _ in range(workers)}
+    logger.info("Pre-fork: %d workers em http://%s:%d", workers, host, port)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            # Worker morreu sozinho: repõe a partir do estado já montado no pai
+            logger.warning("Worker %d encerrou (status %d); iniciando outro.", pid, status)
+            children.add(_spawn_worker(config, sock))
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor pre-fork do classificador")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        print("Erro: o modo pre-fork precisa de os.fork (Linux/macOS).", file=sys.stderr)
+        return 1
+
+    configure_logging()
+    serve(args.workers, args.host, args.port, args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import re
+from typing import Iterator, List
+
+from app.batch import CHARS_PER_TOKEN
+from app.keywords import normalize_text
+
+# Pré-processamento do texto enviado ao modelo: tira o histórico citado, cabeçalhos de
+# encaminhamento, assinaturas e rodapés legais, e escolhe a janela mais informativa dentro do
+# orçamento de tokens. Roda linha a linha e para de ler no início do histórico, que nas
+# respostas costuma ser a maior parte do email.
+#
+# Os padrões valem para o texto cru e para o sanitizado: html.escape troca ">" por "&gt;"
+# e o sanitizador remove "--" ("-----Original Message-----" chega como "-Original Message-").
+
+MIN_CONTENT_CHARS = 10
+# Conteúdo próprio abaixo disso ("Segue abaixo", "FYI") não se sustenta: inclui a mensagem anterior
+SHORT_NOTE_CHARS = 50
+
+_QUOTE = re.compile(r"\s*(?:>|&gt;)")
+# Cabeçalho de resposta ("Em seg., 1 de jan. de 2024, Fulano <x@y.com> escreveu:"), às vezes quebrado em duas linhas
+_REPLY_HEADER = re.compile(r"(?:escreveu|wrote|a écrit|escribió)\s*:$", re.IGNORECASE)
+_REPLY_START = re.compile(r"\s*(?:Em|On|Le|El)\s", re.IGNORECASE)
+_ORIGINAL = re.compile(r"\s*-*\s*(?:original message|mensagem original)\s*-*$", re.IGNORECASE)
+_FORWARD = re.compile(
+    r"\s*-*\s*(?:forwarded message|mensagem encaminhada|in[ií]cio da mensagem encaminhada|begin forwarded message)"
+    r"\s*:?\s*-*$",
+    re.IGNORECASE,
+)
+_HEADER = re.compile(
+    r"\s*\**\s*(?:de|from|para|to|cc|cco|bcc|enviad[ao](?: em)?|sent|data|date|assunto|subject)\s*\**\s*:",
+    re.IGNORECASE,
+)
+_FROM = re.compile(r"\s*\**\s*(?:de|from)\s*\**\s*:", re.IGNORECASE)
+_SEPARATOR = re.compile(r"\s*[_=*-]{8,}\s*$")
+_SIGNOFF = re.compile(
+    r"\s*(?:atenciosamente|att|atte|cordialmente|abs|abra[cç]os|grat[oa]|saudações|"
+    r"best regards|kind regards|regards|sincerely|cheers)\s*[,.!]?\s*$",
+    re.IGNORECASE,
+)
+# Rodapés começam a linha: match ancorado, sem varrer linhas longas posição por posição
+_FOOTER = re.compile(
+    r"\W*(?:aviso legal|disclaimer|antes de imprimir|please consider the environment|enviado do meu|enviado de meu|"
+    r"sent from my|get outlook for|"
+    r"(?:esta mensagem|este e-?mail|this (?:message|e-?mail)|as informações contidas|the information contained)"
+    r".{0,200}?(?:confidencia|sigilos|destinat|intended recipient|privileg))",
+    re.IGNORECASE,
+)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_STOPWORDS = frozenset(
+    b"para pelo pela pelos pelas como mais esta este estes estas isso isto essa esse aquele aquela "
+    b"seus suas voce voces todos todas tudo muito muita pois mesmo ainda entre sobre apos dias tarde "
+    b"noite prezado prezada prezados prezadas caro cara that this with from have your there what will "
+    b"would hello dear team".split()
+)
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    # Gera as linhas sob demanda: quem consome pode parar no histórico sem percorrer o resto
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def strip_email_noise(text: str) -> str:
+    # Só o conteúdo novo: sem citações, cabeçalhos, assinatura e rodapé. O histórico só interrompe
+    # a leitura quando já há conteúdo próprio suficiente; com uma nota curta ("segue abaixo") ou
+    # resposta embaixo da citação, a leitura continua. Se no fim o conteúdo próprio for só uma nota,
+    # as linhas citadas (primeiro nível) entram como conteúdo.
+    kept: List[str] = []
+    quoted: List[str] = []
+    size = 0
+    has_content = False  # conteúdo na mensagem atual (assinatura e rodapé só contam depois dele)
+    skip_headers = False
+    in_signature = False  # depois do fecho de uma nota curta, até o próximo histórico
+    held = None  # linha "De:" aguardando a próxima para saber se abre um bloco de cabeçalhos
+
+    for raw in _iter_lines(text):
+        line = raw.rstrip()
+        stripped = line.strip()
+
+        if held is not None:
+            if _HEADER.match(line):
+                # "De: ... / Enviado: ..." (Outlook): histórico de resposta ou encaminhamento
+                held = None
+                if size >= SHORT_NOTE_CHARS:
+                    break
+                has_content, skip_headers, in_signature = False, True, False
+                continue
+            kept.append(held)
+            size += len(held)
+            has_content = True
+            held = None
+
+        if skip_headers:
+            if not stripped or _HEADER.match(line) or _SEPARATOR.match(line):
+                continue
+            skip_headers = False
+
+        if not stripped:
+            if kept and kept[-1]:
+                kept.append("")
+            continue
+        quote = _QUOTE.match(line)
+        if quote:
+            if size < SHORT_NOTE_CHARS and not _QUOTE.match(line, quote.end()):
+                quoted.append(line[quote.end():].strip())
+            continue
+        if _SEPARATOR.match(line):
+            continue
+
+        boundary = bool(_ORIGINAL.match(line) or _FORWARD.match(line))
+        if not boundary and stripped.endswith(":") and _REPLY_HEADER.search(stripped):
+            # Cabeçalho quebrado: a linha anterior ("Em seg., 1 de jan...") também sai
+            if kept and _REPLY_START.match(kept[-1]) and not _REPLY_START.match(line):
+                size -= len(kept.pop())
+            boundary = True
+        if boundary:
+            if size >= SHORT_NOTE_CHARS:
+                break
+            has_content, skip_headers, in_signature = False, True, False
+            continue
+
+        if _FROM.match(line):
+            held = line
+            continue
+        if in_signature:
+            continue
+        if has_content and _SIGNOFF.match(line):
+            if size >= SHORT_NOTE_CHARS:
+                break
+            # Fecho de uma nota curta: o resto da mensagem atual é assinatura/rodapé
+            in_signature = True
+            continue
+        if _FOOTER.match(line):
+            if has_content and size >= SHORT_NOTE_CHARS:
+                break
+            continue
+
+        kept.append(line)
+        size += len(line)
+        has_content = True
+
+    if held is not None:
+        kept.append(held)
+        size += len(held)
+    if size < SHORT_NOTE_CHARS and quoted:
+        if kept and kept[-1]:
+            kept.append("")
+        kept.extend(quoted)
+    return "\n".join(kept).strip()
+
+
+def _content_words(sentence: str) -> set:
+    # Palavras de conteúdo (4+ letras fora das stopwords, ou números como tickets e valores)
+    return {t for t in normalize_text(sentence).split() if (len(t) >= 4 or t.isdigit()) and t not in _STOPWORDS}
+
+
+def best_window(text: str, max_chars: int) -> str:
+    # Janela contígua de frases com mais palavras de conteúdo distintas dentro de max_chars.
+    # Dois ponteiros com contagem das palavras na janela: saudações repetidas não somam de novo.
+    if len(text) <= max_chars:
+        return text
+    sentences = [s.strip() for s in _SENTENCE.split(text) if s.strip()]
+    if not sentences:
+        return text[:max_chars]
+    words = [_content_words(s) for s in sentences]
+
+    counts = {}
+    best_score, best = -1, (0, 0)
+    left = size = 0
+    for right, sentence in enumerate(sentences):
+        size += len(sentence) + (1 if right > left else 0)
+        for w in words[right]:
+            counts[w] = counts.get(w, 0) + 1
+        while size > max_chars and left <= right:
+            size -= len(sentences[left]) + (1 if right > left else 0)
+            for w in words[left]:
+                counts[w] -= 1
+                if not counts[w]:
+                    del counts[w]
+            left += 1
+        if left <= right and len(counts) > best_score:
+            best_score, best = len(counts), (left, right + 1)
+
+    if best_score < 0:
+        # Nenhuma frase cabe sozinha: a mais informativa, cortada
+        top = max(range(len(sentences)), key=lambda i: len(words[i]))
+        return sentences[top][:max_chars]
+    return " ".join(sentences[best[0]:best[1]])
+
+
+def condense_email(text: str, token_budget: int = 128) -> str:
+    # Texto que vai para o modelo: conteúdo novo do email, limitado a token_budget tokens estimados
+    max_chars = max(1, token_budget * CHARS_PER_TOKEN)
+    content = strip_email_noise(text)
+    if len(content) < MIN_CONTENT_CHARS:
+        # Nada reconhecível como conteúdo novo (ex.: só citação): usa o texto original
+        content = text.strip()
+    return best_window(content, max_chars)
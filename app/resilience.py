@@ -0,0 +1,227 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    # Depois de failure_threshold falhas seguidas, abre e recusa chamadas por recovery_timeout segundos.
+    # Em seguida passa a half-open e deixa passar poucas chamadas de teste: sucesso fecha, falha reabre.
+    # Toda chamada liberada termina em record_success, record_failure ou release; uma chamada de teste
+    # sem resposta depois de probe_timeout libera a vaga mesmo assim.
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30, half_open_max_calls: int = 1,
+                 name: str = "Gemini", probe_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._probe_started = 0.0
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls, name: str = "Gemini") -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+            recovery_timeout=float(os.getenv("GEMINI_BREAKER_RESET", "30")),
+            name=name,
+            probe_timeout=float(os.getenv("GEMINI_TIMEOUT", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+            logger.info("Circuit breaker do %s em half-open: testando a API novamente.", self.name)
+        elif (self._state == HALF_OPEN and self._half_open_calls >= self.half_open_max_calls
+              and time.monotonic() - self._probe_started >= self.probe_timeout):
+            # Chamada de teste perdida (travou sem timeout): libera a vaga para outra
+            self._half_open_calls = 0
+        return self._state
+
+    def accepting(self) -> bool:
+        # allow_request aceitaria agora, sem consumir a vaga da chamada de teste
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                self._probe_started = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit breaker do %s fechado: API respondendo.", self.name)
+            self._state = CLOSED
+            self._failures = 0
+
+    def release(self):
+        # Fim de uma chamada liberada por allow_request. Sem veredito sobre a API (429, outro erro
+        # do cliente, cancelamento), uma chamada de teste conta como falha: a vaga não fica presa.
+        # Depois de record_success (CLOSED) ou record_failure (OPEN) não faz nada.
+        with self._lock:
+            if self._current_state() == HALF_OPEN and self._half_open_calls:
+                self._record_failure_locked()
+
+    def record_failure(self):
+        with self._lock:
+            self._record_failure_locked()
+
+    def _record_failure_locked(self):
+        state = self._current_state()
+        self._failures += 1
+        if state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if state != OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    "Circuit breaker do %s aberto após %d falhas; usando fallback por %ss.",
+                    self.name, self._failures, self.recovery_timeout
+                )
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in": round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 2)
+                if state == OPEN else 0.0,
+            }
+
+
+class AdaptiveLimiter:
+    # Limite de chamadas simultâneas com AIMD: cada sucesso aumenta o limite em 1/limite,
+    # cada 429 corta pela metade. Um Retry-After bloqueia novas chamadas até o prazo indicado.
+    # Começa no teto (max_limit): o limite só cai em resposta a um 429, nunca por precaução.
+
+    def __init__(self, initial: Optional[int] = None, min_limit: int = 1, max_limit: int = 32, name: str = "Gemini"):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        initial = self.max_limit if initial is None else initial
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.throttled = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str = "Gemini") -> "AdaptiveLimiter":
+        return cls(
+            initial=int(os.getenv("GEMINI_CONCURRENCY")) if os.getenv("GEMINI_CONCURRENCY") else None,
+            min_limit=int(os.getenv("GEMINI_MIN_CONCURRENCY", "1")),
+            max_limit=int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")),
+            name=name,
+        )
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def blocked_for(self) -> float:
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if time.monotonic() < self._blocked_until or self._in_flight >= int(self._limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def on_success(self):
+        with self._lock:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        with self._lock:
+            self.throttled += 1
+            self._limit = max(self.min_limit, self._limit / 2)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            logger.warning(
+                "Rate limit do %s: limite de concorrência reduzido para %d%s",
+                self.name, int(self._limit), f", pausa de {retry_after:.0f}s (Retry-After)" if retry_after else ""
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            }
+
+
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)s?\s*$")
+
+
+def retry_after_seconds(e: Exception) -> Optional[float]:
+    # Lê o Retry-After do header HTTP ou o retryDelay ("30s") do RetryInfo no corpo do erro
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            m = _DURATION.match(str(value))
+            if m:
+                return float(m.group(1))
+
+    details = getattr(e, "details", None)
+    if isinstance(details, dict):
+        error = details.get("error", details)
+        for detail in error.get("details", []) or []:
+            if isinstance(detail, dict) and detail.get("retryDelay"):
+                m = _DURATION.match(str(detail["retryDelay"]))
+                if m:
+                    return float(m.group(1))
+    return None
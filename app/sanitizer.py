@@ -0,0 +1,112 @@
+import html
+import re
+from typing import Iterable, Optional, Tuple
+
+# Padrões removidos em linha. Todos são compilados juntos em uma única alternância e
+# foram escritos para rodar em tempo linear: nenhum quantificador ilimitado seguido de
+# algo que force backtracking sobre o mesmo trecho.
+DEFAULT_INLINE_PATTERNS = (
+    r"\bon\w+\s*=",                     # handlers de evento (onclick=, onerror=...)
+    r"javascript:",
+    r"data:text/html",
+    r"\bDROP\s+TABLE\b",
+    r"\bDELETE\s+FROM\b",
+    r"\bINSERT\s+INTO\b",
+    r"\bUPDATE\s+[\w.\"`\[\]]+\s+SET\b",  # UPDATE <tabela> SET, sem atravessar o texto inteiro
+    r"--",
+)
+
+# Blocos delimitados removidos por inteiro (abertura até o fechamento, sem diferenciar maiúsculas).
+# São tratados com busca sequencial em vez de ".*?" para não degradar com aberturas sem fechamento.
+DEFAULT_BLOCK_DELIMITERS = (
+    ("<script", "</script>"),
+    ("/*", "*/"),
+)
+
+_EXCESS_NEWLINES = re.compile(r"\n{3,}")
+
+
+def _first_chars(patterns) -> str:
+    # Primeiro caractere literal de cada padrão (ignorando um \b inicial), ou "" se algum
+    # padrão começar com algo que não seja literal
+    chars = set()
+    for pattern in patterns:
+        if pattern.startswith(r"\b"):
+            pattern = pattern[2:]
+        if not pattern or not (pattern[0].isalnum() or pattern[0] in "-<:/;\"'"):
+            return ""
+        if len(pattern) > 1 and pattern[1] in "?*{|":
+            return ""
+        chars.add(pattern[0].lower())
+    return "".join(sorted(chars))
+
+
+class Sanitizer:
+    def __init__(
+        self,
+        inline_patterns: Iterable[str] = DEFAULT_INLINE_PATTERNS,
+        block_delimiters: Iterable[Tuple[str, str]] = DEFAULT_BLOCK_DELIMITERS,
+    ):
+        inline_patterns = list(inline_patterns)
+        self._inline = None
+        if inline_patterns:
+            body = "|".join(f"(?:{p})" for p in inline_patterns)
+            first = _first_chars(inline_patterns)
+            if first:
+                # Pré-filtro pelo primeiro caractere: evita tentar todas as alternativas em cada posição
+                body = f"(?=[{re.escape(first)}])(?:{body})"
+            self._inline = re.compile(body, re.IGNORECASE)
+        self._blocks = [
+            (re.compile(re.escape(start), re.IGNORECASE), re.compile(re.escape(end), re.IGNORECASE))
+            for start, end in block_delimiters
+        ]
+
+    def _strip_blocks(self, text: str) -> str:
+        for start_re, end_re in self._blocks:
+            parts = []
+            pos = 0
+            while True:
+                start = start_re.search(text, pos)
+                if not start:
+                    break
+                end = end_re.search(text, start.end())
+                if not end:
+                    # Sem fechamento depois daqui: nenhuma abertura posterior fecha também
+                    break
+                parts.append(text[pos:start.start()])
+                pos = end.end()
+            if pos:
+                parts.append(text[pos:])
+                text = "".join(parts)
+        return text
+
+    def sanitize(self, text) -> str:
+        if text is None:
+            return ""
+
+        try:
+            if isinstance(text, bytes):
+                text = text.decode("utf-8", errors="replace")
+        except Exception:
+            text = str(text)
+
+        text = str(text).strip()
+        if not text:
+            return ""
+
+        text = self._strip_blocks(text)
+        if self._inline is not None:
+            text = self._inline.sub("", text)
+
+        text = html.escape(text, quote=True)
+
+        text = _EXCESS_NEWLINES.sub("\n\n", text)
+
+        return text
+
+
+_default_sanitizer = Sanitizer()
+
+
+def sanitize_email_text(text: str, sanitizer: Optional[Sanitizer] = None) -> str:
+    return (sanitizer or _default_sanitizer).sanitize(text)
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    # Coalesce chamadas simultâneas com a mesma chave: a primeira executa, as demais aguardam
+    # o mesmo future e recebem o mesmo resultado (ou a mesma exceção).
+    # O trabalho roda numa task própria, então se o cliente que iniciou desconectar
+    # (cancelando a sua request) os demais continuam esperando normalmente.
+    # A chave inclui o event loop: um future só pode ser aguardado no loop em que foi criado.
+
+    def __init__(self):
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        slot = (asyncio.get_running_loop(), key)
+        future = self._inflight.get(slot)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            logger.debug("Requisição coalescida com outra em andamento (%s)", key[:12])
+            return await asyncio.shield(future)
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[slot] = task
+        with self._lock:
+            self.leaders += 1
+        task.add_done_callback(lambda _: self._inflight.pop(slot, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._inflight),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Conexões herdadas de um fork, mantidas vivas para não serem fechadas pelo GC no filho
+_inherited_connections = []
+
+Statement = Tuple[str, Sequence]
+
+# Gravações aguardando a thread de escrita; com a fila cheia (disco travado) as novas são descartadas
+WRITE_QUEUE_SIZE = 10000
+# Gravações agrupadas no mesmo commit
+WRITE_BATCH = 256
+
+_stores: "weakref.WeakSet[SQLiteStore]" = weakref.WeakSet()
+
+
+class SQLiteStore:
+    # Conexão SQLite das estruturas persistidas em disco (cache de classificações, quase-duplicatas),
+    # com o schema criado na abertura. Conexões SQLite não podem atravessar um fork (modo pre-fork):
+    # o filho abre a sua, e after_fork deixa o dono recriar os próprios locks.
+    # Gravações vão por submit() para uma thread de escrita: quem chama (o event loop, no caminho de
+    # /classify) só enfileira, e fsync ou disputa de lock no arquivo não chegam à requisição.
+    # Leituras usam uma conexão própria: com WAL não esperam pelos commits da thread de escrita.
+
+    def __init__(self, path: str, schema: Iterable[str], description: str,
+                 after_fork: Optional[Callable[[], None]] = None):
+        self.path = path
+        self.schema = list(schema)
+        self.description = description
+        self._after_fork = after_fork
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self.db: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self.dropped_writes = 0
+        self._open()
+        self._start_writer()
+        os.register_at_fork(after_in_child=self._reopen_after_fork)
+        _stores.add(self)
+
+    @property
+    def available(self) -> bool:
+        return self.db is not None
+
+    def _open(self):
+        try:
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            # Com WAL, NORMAL só faz fsync no checkpoint: uma queda de energia perde no máximo as últimas gravações
+            db.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                db.execute(statement)
+            db.commit()
+            self._reader = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self.db = db
+            logger.info("%s persistente em %s", self.description, self.path)
+        except Exception as e:
+            logger.error("Falha ao abrir SQLite (%s) em %s: %s. Usando apenas memória.", self.description, self.path, e)
+            self.db = None
+            self._reader = None
+
+    def _reopen_after_fork(self):
+        # As conexões herdadas não são fechadas (fechar mexeria nos locks do pai); só deixam de ser usadas
+        _inherited_connections.extend([self.db, self._reader])
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self.db = None
+        self._reader = None
+        self._open()
+        # A thread de escrita do pai não existe no filho; a fila herdada fica com o pai
+        self._start_writer()
+        if self._after_fork is not None:
+            self._after_fork()
+
+    def _start_writer(self):
+        self._writes: queue.Queue = queue.Queue(WRITE_QUEUE_SIZE)
+        threading.Thread(target=self._write_loop, args=(self._writes,), daemon=True,
+                         name="sqlite-writer").start()
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def write(self, statements: List[Statement]):
+        # Executa os comandos numa só transação, na thread de quem chama
+        with self._lock:
+            for sql, params in statements:
+                self.db.execute(sql, params)
+            self.db.commit()
+
+    def submit(self, statements: List[Statement]):
+        # Enfileira para a thread de escrita, sem bloquear
+        try:
+            self._writes.put_nowait(statements)
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Espera as gravações enfileiradas até agora
+        done = threading.Event()
+        try:
+            self._writes.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _write_loop(self, writes: queue.Queue):
+        while True:
+            batch = [writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(writes.get_nowait())
+                except queue.Empty:
+                    break
+            statements = [st for item in batch if not isinstance(item, threading.Event) for st in item]
+            if statements and self.db is not None:
+                try:
+                    self.write(statements)
+                except Exception as e:
+                    logger.warning("Falha ao gravar SQLite (%s): %s", self.description, e)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def stats(self) -> Dict:
+        return {"pending_writes": self._writes.qsize(), "dropped_writes": self.dropped_writes}
+
+
+def flush_all(timeout: float = 2.0):
+    # Grava o que está pendente em todos os stores; no encerramento (inclusive antes de os._exit)
+    for store in list(_stores):
+        store.flush(timeout)
+
+
+atexit.register(flush_all)
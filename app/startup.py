@@ -0,0 +1,75 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Perfil do startup: tempo de import e de inicialização de cada componente, mais os marcos
+# (app importado, keywords prontas, Gemini pronto) medidos desde a criação do processo.
+
+
+def _process_age() -> float:
+    # Segundos desde a criação do processo, lidos do /proc (Linux); 0 em outros sistemas
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class StartupProfile:
+    def __init__(self):
+        self.origin = time.perf_counter() - _process_age()
+        self._phases: List[Dict] = []
+        self._milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reset_after_fork(self):
+        # No filho do pre-fork o relógio recomeça; as fases do pai ficam (foram pagas uma vez só)
+        self.origin = time.perf_counter()
+        self._milestones = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, kind: str = "init"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._phases.append({"name": name, "kind": kind, "seconds": round(elapsed, 4)})
+            logger.debug("Startup: %s %s em %.3fs", kind, name, elapsed)
+
+    def mark(self, milestone: str):
+        # Só o primeiro registro de cada marco vale
+        with self._lock:
+            self._milestones.setdefault(milestone, round(time.perf_counter() - self.origin, 4))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"phases": list(self._phases), "milestones": dict(self._milestones)}
+
+    def summary(self) -> str:
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p["seconds"], reverse=True)
+            return ", ".join(f"{p['name']}={p['seconds'] * 1000:.0f}ms" for p in phases[:8])
+
+
+STARTUP = StartupProfile()
+
+
+def lazy_import(module: str):
+    # Importa na primeira chamada e registra o custo; imports seguintes saem do sys.modules
+    if module in sys.modules:
+        return sys.modules[module]
+    with STARTUP.phase(module, kind="import"):
+        return importlib.import_module(module)
@@ -0,0 +1,115 @@
+import codecs
+import json
+import logging
+from typing import Dict
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    # Subclasse de HTTPException para atravessar o parsing do formulário do FastAPI sem virar 400
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Arquivo muito grande. Máximo {max_bytes // (1024 * 1024)}MB.")
+        self.max_bytes = max_bytes
+
+
+class TextTooLong(ValueError):
+    # O texto decodificado passou de max_chars: o upload é recusado, nunca truncado em silêncio
+    def __init__(self, max_chars: int):
+        super().__init__(f"Texto com mais de {max_chars} caracteres.")
+        self.max_chars = max_chars
+
+
+class UploadLimitMiddleware:
+    # Middleware ASGI que limita o tamanho do corpo das requisições por rota.
+    # Recusa pelo Content-Length quando ele vem no header e, de qualquer forma, conta os bytes
+    # à medida que chegam, abortando assim que o limite é ultrapassado (uploads chunked inclusive).
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    too_large = int(value) > max_bytes
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    logger.info("Upload recusado pelo Content-Length: %s bytes", value.decode())
+                    await self._reject(send, max_bytes)
+                    return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    logger.info("Upload abortado após %d bytes (limite %d)", received, max_bytes)
+                    raise UploadTooLarge(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send, max_bytes: int):
+        body = json.dumps({"error": UploadTooLarge(max_bytes).detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload_bytes(upload, max_bytes: int) -> bytes:
+    # Lê em blocos e aborta assim que passar de max_bytes, sem carregar o resto
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def read_upload_text(upload, max_bytes: int, max_chars: int) -> str:
+    # Decodifica UTF-8 incrementalmente e para de ler (TextTooLong) assim que passar de max_chars caracteres
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    chars = 0
+    total = 0
+    while chars < max_chars:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            parts.append(decoder.decode(b"", final=True))
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        text = decoder.decode(chunk)
+        parts.append(text)
+        chars += len(text)
+    if chars > max_chars:
+        raise TextTooLong(max_chars)
+    return "".join(parts)
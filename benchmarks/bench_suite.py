@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# Suíte de benchmark do /classify contra o stub local do Gemini (benchmarks/gemini_stub.py).
+# Sobe o stub e o serviço (uvicorn em subprocesso apontando GEMINI_BASE_URL para o stub),
+# dispara requisições concorrentes com uma mistura de texto, .txt e .pdf e mede, por cenário,
+# req/s, p50/p95/p99, taxa de erros e o método usado. O resultado vai para um JSON em
+# benchmarks/results/ (ignorado pelo git) para comparar execuções ao longo do tempo.
+#
+# Uso: python benchmarks/bench_suite.py [--scenarios baseline,outage] [--requests 200] [--concurrency 16]
+#      python benchmarks/bench_suite.py --target http://host:8000 --stub http://host:8787  (serviço já rodando)
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gemini_stub import StubServer
+from pdf_bench import make_pdf
+
+EMAILS = [
+    "Preciso de ajuda urgente com o acesso ao sistema, meu login está bloqueado.",
+    "Qual o status do chamado referente à fatura do mês passado? Ainda não tive retorno.",
+    "Feliz aniversário! Desejo muito sucesso e um ótimo dia para toda a equipe.",
+    "Obrigado pelo atendimento de ontem, foi muito bom contar com vocês.",
+    "O relatório financeiro apresenta erro na coluna de saldo, podem verificar?",
+]
+
+# Cada cenário: configuração do stub, mistura de uploads e quantidade de requisições (fração do --requests)
+SCENARIOS = {
+    "baseline": {
+        "stub": {"latency": "lognormal:300:0.5"},
+        "mix": {"text": 0.6, "txt": 0.25, "pdf": 0.15},
+    },
+    "cache_warm": {
+        # Poucos textos repetidos, com uma passada de aquecimento antes da medição
+        "stub": {"latency": "lognormal:300:0.5"},
+        "mix": {"text": 1.0},
+        "unique": False,
+        "warmup": True,
+    },
+    "large_pdfs": {
+        "stub": {"latency": "lognormal:300:0.5"},
+        "mix": {"pdf": 1.0},
+        "pdf_pages": 200,
+        "scale": 0.25,
+    },
+    "malformed_replies": {
+        "stub": {"latency": "lognormal:300:0.5", "malformed": 0.3},
+        "mix": {"text": 1.0},
+    },
+    "rate_limit_storm": {
+        "stub": {"latency": "lognormal:300:0.5", "rate_429": 0.6, "retry_after": 1},
+        "mix": {"text": 1.0},
+    },
+    "gemini_outage": {
+        "stub": {"latency": "fixed:50", "rate_503": 1.0},
+        "mix": {"text": 1.0},
+    },
+}
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def build_payloads(scenario: dict, total: int, seed: int):
+    # Tudo é gerado antes da medição, para o custo de montar PDFs não entrar na latência
+    rng = random.Random(seed)
+    kinds, weights = zip(*scenario["mix"].items())
+    unique = scenario.get("unique", True)
+    pages = scenario.get("pdf_pages", 2)
+    payloads = []
+    for i in range(total):
+        kind = rng.choices(kinds, weights)[0]
+        text = rng.choice(EMAILS)
+        if unique:
+            # Sufixo único para cada requisição não cair no cache de classificações
+            text = f"{text} Ref {seed}-{i}."
+        if kind == "text":
+            payloads.append(("text", {"data": {"email_text": text}}))
+        elif kind == "txt":
+            payloads.append(("txt", {"files": {"file": ("email.txt", text.encode("utf-8"), "text/plain")}}))
+        else:
+            pdf = make_pdf(pages, 5, line=text)
+            payloads.append(("pdf", {"files": {"file": ("email.pdf", pdf, "application/pdf")}}))
+    return payloads
+
+
+def drive(target: str, payloads, concurrency: int):
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def one(payload):
+        kind, kwargs = payload
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            r = session.post(f"{target}/classify", timeout=120, **kwargs)
+            status = r.status_code
+            metodo = r.json().get("metodo") if status == 200 else None
+        except requests.RequestException as e:
+            status, metodo = type(e).__name__, None
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((kind, status, metodo, elapsed))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, duration: float) -> dict:
+    latencies = sorted(r[3] for r in results)
+    statuses = Counter(str(r[1]) for r in results)
+    errors = sum(n for s, n in statuses.items() if s != "200")
+    by_kind = {}
+    for kind in sorted({r[0] for r in results}):
+        kind_lat = sorted(r[3] for r in results if r[0] == kind)
+        by_kind[kind] = {
+            "requests": len(kind_lat),
+            "p50_ms": round(percentile(kind_lat, 50) * 1000, 1),
+            "p99_ms": round(percentile(kind_lat, 99) * 1000, 1),
+        }
+    return {
+        "requests": len(results),
+        "duration_s": round(duration, 3),
+        "req_per_s": round(len(results) / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "status": dict(statuses),
+        "metodo": dict(Counter(r[2] for r in results if r[2])),
+        "by_kind": by_kind,
+    }
+
+
+def start_service(stub_url: str, port: int):
+    env = {
+        **os.environ,
+        "GOOGLE_API_KEY": "benchmark",
+        "GEMINI_BASE_URL": stub_url,
+        # Breaker se recupera rápido para um cenário não contaminar o seguinte
+        "GEMINI_BREAKER_RESET": "2",
+        # Os textos únicos só mudam no número de referência: sem o índice de quase-duplicatas,
+        # cada requisição chega de fato ao stub
+        "NEARDUP_THRESHOLD": "0",
+    }
+    env.pop("CLASSIFY_CACHE_PATH", None)
+    env.pop("NEARDUP_PATH", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=str(ROOT), env=env,
+    )
+    target = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Serviço encerrou durante o startup")
+        try:
+            if requests.get(f"{target}/ready", timeout=1).status_code == 200:
+                return proc, target
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Serviço não ficou pronto em 60s")
+
+
+def configure_stub(stub, stub_url: str, config: dict):
+    if stub is not None:
+        stub.state.configure(config)
+    else:
+        requests.post(f"{stub_url}/_config", json=config, timeout=5).raise_for_status()
+
+
+def stub_stats(stub, stub_url: str) -> dict:
+    if stub is not None:
+        return stub.state.stats()["counts"]
+    return requests.get(f"{stub_url}/_stats", timeout=5).json()["counts"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), text=True).strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do /classify com stub do Gemini")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Cenários separados por vírgula")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765, help="Porta do serviço iniciado pela suíte")
+    parser.add_argument("--stub-port", type=int, default=8787)
+    parser.add_argument("--target", help="URL de um serviço já rodando (não inicia o serviço)")
+    parser.add_argument("--stub", help="URL de um stub já rodando (não inicia o stub)")
+    parser.add_argument("--out", help="Arquivo JSON de saída (padrão: benchmarks/results/bench-<data>.json)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Cenários desconhecidos: {', '.join(unknown)}")
+
+    stub = None if args.stub else StubServer(args.stub_port).start()
+    stub_url = args.stub or stub.url
+    proc, target = (None, args.target) if args.target else start_service(stub_url, args.port)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "params": {"requests": args.requests, "concurrency": args.concurrency, "seed": args.seed},
+        "scenarios": {},
+    }
+    try:
+        for n, name in enumerate(names):
+            scenario = SCENARIOS[name]
+            total = max(1, int(args.requests * scenario.get("scale", 1)))
+            payloads = build_payloads(scenario, total, args.seed * 1000 + n)
+            configure_stub(stub, stub_url, scenario["stub"])
+            # Espera o breaker/limitador de um cenário anterior se recuperar
+            time.sleep(2.5)
+            if scenario.get("warmup"):
+                drive(target, payloads, args.concurrency)
+                configure_stub(stub, stub_url, scenario["stub"])
+
+            results, duration = drive(target, payloads, args.concurrency)
+            summary = summarize(results, duration)
+            summary["stub"] = stub_stats(stub, stub_url)
+            summary["stub_config"] = scenario["stub"]
+            report["scenarios"][name] = summary
+            print(
+                f"{name:<18} {summary['req_per_s']:>8.1f} req/s  p50={summary['p50_ms']:>7.1f}ms  "
+                f"p95={summary['p95_ms']:>7.1f}ms  p99={summary['p99_ms']:>7.1f}ms  "
+                f"erros={summary['error_rate']:.1%}  metodo={summary['metodo']}"
+            )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if stub is not None:
+            stub.stop()
+
+    out = Path(args.out) if args.out else (
+        Path(__file__).resolve().parent / "results" / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Resultados salvos em {out}")
+
+
+if __name__ == "__main__":
+    main()
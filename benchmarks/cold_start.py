@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Benchmark de cold start: tempo desde o início do processo até a primeira classificação com
+# sucesso em /classify e até o /ready, com uvicorn simples e com o modo pre-fork (app.prefork).
+# O serviço aponta para o stub local do Gemini, então o import do SDK entra na conta como em produção.
+#
+# Uso: python benchmarks/cold_start.py [--runs 5] [--workers 2]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gemini_stub import StubServer
+
+EMAIL = "Preciso de ajuda urgente com o acesso ao sistema, meu login está bloqueado."
+
+
+def measure(cmd, port: int, env, timeout: float = 60):
+    target = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_ok = first_metodo = ready = None
+    session = requests.Session()
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if first_ok is None:
+                    r = session.post(f"{target}/classify", data={"email_text": EMAIL}, timeout=5)
+                    if r.status_code == 200:
+                        first_ok = time.perf_counter() - start
+                        first_metodo = r.json().get("metodo")
+                if ready is None and session.get(f"{target}/ready", timeout=5).status_code == 200:
+                    ready = time.perf_counter() - start
+                if first_ok is not None and ready is not None:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        startup = None
+        try:
+            startup = session.get(f"{target}/stats", timeout=5).json().get("startup")
+        except (requests.RequestException, ValueError):
+            pass
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return first_ok, first_metodo, ready, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cold start do serviço")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2, help="Workers no modo pre-fork")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    stub = StubServer(8788, {"latency": "fixed:50"}).start()
+    env = {**os.environ, "GOOGLE_API_KEY": "benchmark", "GEMINI_BASE_URL": stub.url}
+    env.pop("PRELOAD_MODELS", None)
+
+    modes = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+                    "--log-level", "warning"],
+        "prefork": [sys.executable, "-m", "app.prefork", "--workers", str(args.workers), "--host", "127.0.0.1",
+                    "--port", str(args.port), "--log-level", "warning"],
+    }
+    try:
+        for name, cmd in modes.items():
+            first, ready, metodos = [], [], []
+            startup = None
+            for _ in range(args.runs):
+                first_ok, metodo, ready_at, startup = measure(cmd, args.port, env)
+                if first_ok is not None:
+                    first.append(first_ok)
+                    metodos.append(metodo)
+                if ready_at is not None:
+                    ready.append(ready_at)
+            print(
+                f"{name:<8} primeira classificação: mediana {statistics.median(first) * 1000:7.0f}ms "
+                f"({', '.join(sorted(set(metodos)))})   /ready: mediana {statistics.median(ready) * 1000:7.0f}ms"
+            )
+            if startup:
+                phases = sorted(startup["phases"], key=lambda p: p["seconds"], reverse=True)[:5]
+                print("         fases: " + ", ".join(f"{p['name']}={p['seconds'] * 1000:.0f}ms" for p in phases))
+                print(f"         marcos do worker: {startup['milestones']}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Servidor local que imita o endpoint generateContent da API do Gemini, para medir o serviço
+# sem gastar cota. Latência, 429, 503 e respostas malformadas são configuráveis (também por modelo
+# ou por chave de API) e podem ser trocados em tempo de execução com POST /_config; GET /_stats
+# devolve o que foi injetado.
+#
+# O EmailClassifier passa a usar o stub com GEMINI_BASE_URL=http://127.0.0.1:8787 (e qualquer GOOGLE_API_KEY).
+#
+# Uso: python benchmarks/gemini_stub.py [--port 8787] [--latency lognormal:300:0.5] [--rate-429 0.1] [--rate-503 0.05]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DEFAULT_CONFIG = {
+    # fixed:<ms> | uniform:<min_ms>:<max_ms> | lognormal:<mediana_ms>:<sigma>
+    "latency": "lognormal:300:0.5",
+    "rate_429": 0.0,
+    "rate_503": 0.0,
+    "malformed": 0.0,
+    "retry_after": 1,
+    # Sobrescritas por modelo ou por chave de API, ex.: {"per_model": {"gemini-2.5-flash-lite": {"rate_429": 1}}}
+    "per_model": {},
+    "per_key": {},
+}
+
+
+def parse_latency(spec: str):
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median / 1000
+    raise ValueError(f"Distribuição de latência desconhecida: {spec}")
+
+
+class StubState:
+    def __init__(self, config=None):
+        self._lock = threading.Lock()
+        self.configure(config or {})
+
+    def configure(self, config):
+        with self._lock:
+            self.config = {**DEFAULT_CONFIG, **config}
+            self.sample_latency = parse_latency(self.config["latency"])
+            self._samplers = {}
+            self.counts = Counter()
+
+    def resolve(self, model: str, key: str):
+        # Configuração efetiva da chamada: padrão, depois sobrescritas do modelo e da chave
+        config = {
+            **self.config,
+            **(self.config["per_model"].get(model) or {}),
+            **(self.config["per_key"].get(key) or {}),
+        }
+        if config["latency"] == self.config["latency"]:
+            return config, self.sample_latency
+        with self._lock:
+            sampler = self._samplers.get(config["latency"])
+            if sampler is None:
+                sampler = self._samplers[config["latency"]] = parse_latency(config["latency"])
+        return config, sampler
+
+    def stats(self):
+        with self._lock:
+            return {"config": self.config, "counts": dict(self.counts)}
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+
+def _error(code: int, status: str, message: str, retry_after=None):
+    error = {"code": code, "message": message, "status": status}
+    headers = {}
+    if retry_after:
+        error["details"] = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_after}s"}]
+        headers["Retry-After"] = str(retry_after)
+    return JSONResponse(status_code=code, content={"error": error}, headers=headers)
+
+
+def _candidate(text: str):
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 2, "totalTokenCount": 102},
+    }
+
+
+def _prompt_text(body) -> str:
+    parts = []
+    for content in body.get("contents") or []:
+        for part in content.get("parts") or []:
+            parts.append(part.get("text") or "")
+    return "\n".join(parts)
+
+
+REPLIES = {
+    "Produtivo": "Recebemos sua solicitação sobre o assunto descrito e nossa equipe já está verificando. Retornaremos com uma atualização.",
+    "Improdutivo": "Muito obrigado pela mensagem e pelas palavras gentis! Ficamos à disposição.",
+}
+
+
+def _answer(prompt: str, body) -> str:
+    # Categoria e confiança determinísticas por hash do prompt. Com responseSchema (classificação com
+    # resposta contextual) devolve {"categoria", "confianca", "resposta"}; prompts em lote (JSON sem
+    # schema) recebem {"id": {"categoria", "confianca"}} por email
+    digest = hashlib.md5(prompt.encode()).digest()
+    categoria = "Produtivo" if digest[0] % 2 else "Improdutivo"
+    confianca = round(0.55 + digest[1] / 255 * 0.44, 2)
+    generation = body.get("generationConfig") or {}
+    if generation.get("responseSchema"):
+        return json.dumps({"categoria": categoria, "confianca": confianca, "resposta": REPLIES[categoria]},
+                          ensure_ascii=False)
+    if generation.get("responseMimeType") == "application/json":
+        ids = [line.split("### ID:", 1)[1].strip() for line in prompt.splitlines() if "### ID:" in line]
+        return json.dumps({i: {"categoria": categoria, "confianca": confianca} for i in ids}, ensure_ascii=False)
+    return categoria
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="Gemini stub")
+
+    @app.post("/_config")
+    async def configure(request: Request):
+        state.configure(await request.json())
+        return state.stats()
+
+    @app.get("/_stats")
+    async def stats():
+        return state.stats()
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate_content(version: str, model_action: str, request: Request):
+        body = await request.json()
+        model = model_action.split(":", 1)[0]
+        state.count("requests")
+        state.count(f"requests:{model}")
+        config, sample_latency = state.resolve(model, request.headers.get("x-goog-api-key", ""))
+        await asyncio.sleep(sample_latency())
+
+        roll = random.random()
+        if roll < config["rate_503"]:
+            state.count("injected_503")
+            return _error(503, "UNAVAILABLE", "The model is overloaded. Please try again later.")
+        roll -= config["rate_503"]
+        if roll < config["rate_429"]:
+            state.count("injected_429")
+            return _error(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted.", config["retry_after"])
+        roll -= config["rate_429"]
+        if roll < config["malformed"]:
+            state.count("malformed")
+            return JSONResponse(_candidate(random.choice(["talvez", "Produtivo ou Improdutivo?", ""])))
+
+        state.count("ok")
+        return JSONResponse(_candidate(_answer(_prompt_text(body), body)))
+
+    return app
+
+
+class StubServer:
+    # Sobe o stub com uvicorn numa thread, para uso dentro de outros scripts de benchmark
+
+    def __init__(self, port: int = 8787, config=None):
+        import uvicorn
+
+        self.state = StubState(config)
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(create_app(self.state), host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Stub do Gemini não iniciou a tempo")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da API do Gemini")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", default=DEFAULT_CONFIG["latency"])
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-503", type=float, default=0.0)
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    state = StubState({
+        "latency": args.latency,
+        "rate_429": args.rate_429,
+        "rate_503": args.rate_503,
+        "malformed": args.malformed,
+        "retry_after": args.retry_after,
+    })
+    print(f"Stub do Gemini em http://127.0.0.1:{args.port} (use GEMINI_BASE_URL com esse endereço)")
+    uvicorn.run(create_app(state), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Microbenchmark do fallback por keywords: varredura antiga (uma busca de substring por keyword)
+# contra o KeywordMatcher (montado uma vez no __init__) em textos de 5000 caracteres.
+#
+# Uso: python benchmarks/keywords_bench.py [--runs 2000]
+
+import argparse
+import logging
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.classifier import EmailClassifier
+
+
+def legacy_counts(classifier: EmailClassifier, email_text: str) -> tuple:
+    email_lower = email_text.lower()
+    productive_count = sum(1 for kw in classifier.productive_keywords if kw in email_lower)
+    unproductive_count = sum(1 for kw in classifier.unproductive_keywords if kw in email_lower)
+    return productive_count, unproductive_count
+
+
+SENTENCES = [
+    "Prezados, bom dia.",
+    "Gostaria de verificar o andamento da minha solicitação aberta na semana passada.",
+    "O sistema apresenta erro ao fazer login desde ontem à tarde.",
+    "A equipe do projeto se reuniu na sede da empresa para revisar o cronograma.",
+    "Foi uma semana intensa, mas conseguimos entregar o relatório para o cliente.",
+    "Segue em anexo a planilha com os valores atualizados do último trimestre.",
+    "Na cidade de São Paulo a reunião acontecerá no auditório principal.",
+    "Queria agradecer a todos pelo empenho e desejar boas festas!",
+    "Por favor, confirmem a presença até sexta-feira.",
+    "Atenciosamente, João da Silva, Coordenação Administrativa.",
+]
+
+
+def make_inputs(classifier: EmailClassifier, n: int = 20, size: int = 5000, dense: bool = False) -> list:
+    # dense=False: prosa de email com algumas keywords; dense=True: só keywords (pior caso do matcher)
+    rng = random.Random(42)
+    vocab = classifier.productive_keywords + classifier.unproductive_keywords if dense else SENTENCES
+    inputs = []
+    for _ in range(n):
+        words = []
+        while sum(len(w) + 1 for w in words) < size:
+            words.append(rng.choice(vocab))
+        inputs.append(" ".join(words)[:size])
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do matcher de keywords")
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    classifier = EmailClassifier()
+    matcher = classifier.keyword_matcher
+
+    for label, dense in (("prosa", False), ("só keywords", True)):
+        inputs = make_inputs(classifier, dense=dense)
+
+        def run_legacy():
+            for text in inputs:
+                legacy_counts(classifier, text)
+
+        def run_matcher():
+            for text in inputs:
+                matcher.match(text)
+
+        per_call = {}
+        print(f"[{label}]")
+        for name, fn in (("substring (antigo)", run_legacy), ("KeywordMatcher", run_matcher)):
+            loops = max(1, args.runs // len(inputs))
+            best = min(timeit.repeat(fn, number=loops, repeat=5))
+            per_call[name] = best / (loops * len(inputs)) * 1e6
+            print(f"  {name:<20} {per_call[name]:10.1f} µs/email (5000 caracteres)")
+
+        print(f"  speedup: {per_call['substring (antigo)'] / per_call['KeywordMatcher']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
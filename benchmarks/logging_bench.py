@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Benchmark do custo dos logs na thread da requisição: StreamHandler síncrono com f-strings (como era)
+# contra o handler com fila de app.logs (formatação lazy, JSON montado no listener), com e sem
+# amostragem. Cada "requisição" emite as linhas INFO/DEBUG de uma classificação típica.
+# --write-ms simula um stream lento (disco, pipe do coletor cheio): só o modo síncrono espera por ele.
+#
+# Uso: python benchmarks/logging_bench.py [--requests 20000] [--write-ms 0] [--sample-rate 0.01]
+
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.logs import JsonFormatter, NonBlockingQueueHandler, RequestContextFilter, SamplingFilter
+
+
+class SlowStream:
+    def __init__(self, path: str, write_ms: float):
+        self.file = open(path, "w", encoding="utf-8")
+        self.delay = write_ms / 1000
+
+    def write(self, data: str):
+        if self.delay:
+            time.sleep(self.delay)
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def eager_request(logger: logging.Logger, i: int):
+    # As linhas de antes: f-strings montadas mesmo com o nível desligado
+    logger.debug(f"Chamando Gemini API (key1/gemini-2.5-flash) para classificação... (tentativa 1/{3})")
+    logger.info(f"Resposta bruta da IA: Produtivo -> interpretado como: {'Produtivo'}")
+    logger.info(f"   Palavras produtivas encontradas: {i % 7}")
+    logger.info(f"   Palavras improdutivas encontradas: {i % 3}")
+    logger.info(f"IA (Gemini): Produtivo ({95.0}%)")
+
+
+def lazy_request(logger: logging.Logger, i: int):
+    logger.debug("Chamando Gemini API (%s) para classificação... (tentativa %d/%d)", "key1/gemini-2.5-flash", 1, 3)
+    logger.debug("Resposta bruta da IA: %s -> interpretado como: %s", "Produtivo", "Produtivo")
+    logger.debug("Palavras encontradas: %d produtivas, %d improdutivas", i % 7, i % 3)
+    logger.info("IA (Gemini): %s (%s%%)", "Produtivo", 95.0)
+
+
+def run(name: str, handler: logging.Handler, emit, requests: int, listener=None):
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if listener:
+        listener.start()
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        emit(logger, i)
+        timings.append(time.perf_counter() - start)
+    if listener:
+        listener.stop()
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(0.99 * len(timings)))]
+    print(f"{name:<34} média {statistics.mean(timings) * 1e6:8.1f}µs  p99 {p99 * 1e6:8.1f}µs por requisição")
+
+
+def queued(stream, sampling: SamplingFilter, size: int):
+    log_queue = queue.Queue(size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(sampling)
+    handler.addFilter(RequestContextFilter())
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    return handler, QueueListener(log_queue, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do custo dos logs por requisição")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--write-ms", type=float, default=0.0, help="Atraso simulado por escrita no stream")
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    out = os.devnull
+    sync = logging.StreamHandler(SlowStream(out, args.write_ms))
+    sync.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    run("síncrono, f-strings", sync, eager_request, args.requests)
+
+    handler, listener = queued(SlowStream(out, args.write_ms), SamplingFilter(), args.queue_size)
+    run("fila, lazy", handler, lazy_request, args.requests, listener)
+    print(f"{'':<34} descartados com a fila cheia: {handler.dropped}")
+
+    sampling = SamplingFilter(args.sample_rate)
+    handler, listener = queued(SlowStream(out, args.write_ms), sampling, args.queue_size)
+    run(f"fila, lazy, amostragem {args.sample_rate:g}", handler, lazy_request, args.requests, listener)
+    print(f"{'':<34} descartados pela amostragem: {sampling.dropped}")
+
+
+if __name__ == "__main__":
+    main()
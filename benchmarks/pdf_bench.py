@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Benchmark da extração de PDF com PDFs sintéticos gerados localmente.
+# Compara a extração completa (comportamento antigo) com a extração limitada por orçamento
+# de caracteres, e mede a vazão do pool de processos com vários PDFs simultâneos.
+#
+# Uso: python benchmarks/pdf_bench.py [--pages 300] [--concurrency 8]
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.pdf import extract_text_from_pdf, extract_text_from_pdf_async, shutdown_pool
+
+# Mesmo orçamento do serviço (limite do texto bruto); PDFs com mais texto são recusados na extração
+MAX_CHARS = int(os.getenv("SANITIZE_MAX_INPUT_CHARS", "50000"))
+LINE = "Prezados, solicito o status do chamado 12345 referente ao acesso ao sistema financeiro."
+
+
+def make_pdf(pages: int, lines_per_page: int = 40, line: str = LINE) -> bytes:
+    # PDF mínimo com uma fonte Helvetica e uma stream de texto por página
+    line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, preenchido depois
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for p in range(pages):
+        content = ["BT /F1 9 Tf 40 800 Td 11 TL"]
+        for n in range(lines_per_page):
+            content.append(f"({line} p{p + 1} l{n + 1}) '")
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def pool_throughput(pdf: bytes, concurrency: int) -> float:
+    # return_exceptions: PDFs acima do orçamento terminam em PdfTextTooLong, também depois de extrair até o limite
+    await asyncio.gather(extract_text_from_pdf_async(pdf, max_chars=MAX_CHARS), return_exceptions=True)  # aquece o pool
+    start = time.perf_counter()
+    await asyncio.gather(*(extract_text_from_pdf_async(pdf, max_chars=MAX_CHARS) for _ in range(concurrency)),
+                         return_exceptions=True)
+    return concurrency / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extração de PDF")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    pdf = make_pdf(args.pages)
+    print(f"PDF sintético: {args.pages} páginas, {len(pdf) / 1024:.0f} KiB")
+
+    full, full_ms = timed(extract_text_from_pdf, pdf)
+    budget, budget_ms = timed(extract_text_from_pdf, pdf, max_chars=MAX_CHARS, max_pages=50)
+    print(f"extração completa:   {full_ms:9.1f} ms  ({len(full)} caracteres)")
+    print(f"extração com limite: {budget_ms:9.1f} ms  ({len(budget)} caracteres)")
+    print(f"speedup: {full_ms / budget_ms:.1f}x")
+
+    rate = asyncio.run(pool_throughput(pdf, args.concurrency))
+    print(f"pool de processos: {rate:.1f} PDFs/s com {args.concurrency} simultâneos")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# Benchmark do pré-processamento (app.preprocess.condense_email) contra o corte cego em 512 caracteres.
+# Gera emails sintéticos com o que aparece em caixas reais: saudação, conteúdo novo, assinatura,
+# rodapé legal e histórico citado em formatos diferentes (Gmail pt/en, Outlook, encaminhamento, ">",
+# resposta acima ou abaixo da citação),
+# já passados pela sanitização como em /classify. Mede o custo por email, os tokens estimados
+# enviados ao modelo e em quantos casos o conteúdo novo chega inteiro ao prompt.
+# Também mede entradas adversariais no limite de 5000 caracteres aceito por /classify.
+#
+# Uso: python benchmarks/preprocess_bench.py [--emails 5000] [--budget 128] [--seed 1]
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.batch import estimate_tokens
+from app.preprocess import condense_email
+from app.sanitizer import sanitize_email_text
+
+GREETINGS = ["Bom dia,", "Olá equipe,", "Prezados,", "Boa tarde, tudo bem?", "Hi team,", ""]
+CONTENT = [
+    "Ainda não consegui acessar o sistema financeiro, o erro 403 continua desde a atualização de ontem. "
+    "Podem verificar o chamado {n}?",
+    "O boleto {n} foi pago na sexta mas continua aparecendo como pendente no portal, preciso da baixa urgente.",
+    "Preciso da segunda via da fatura {n} e da alteração do e-mail de cobrança para o financeiro.",
+    "Obrigado pelo atendimento de ontem, o problema foi resolvido e a equipe ficou muito satisfeita.",
+    "Feliz aniversário! Desejamos muito sucesso e um ótimo ano para você e sua família.",
+    "O relatório de saldo da conta {n} apresenta divergência de R$ 1.200 na coluna de juros, podem corrigir?",
+]
+SIGNATURES = [
+    "Atenciosamente,\nJoão Silva\nAnalista Financeiro | Empresa S.A.\nTel: (11) 99999-0000",
+    "Abraços,\nMaria",
+    "Att,\nCarlos Souza\nGerente de Operações",
+    "Best regards,\nAna Lima\nHead of Finance",
+    "Enviado do meu iPhone",
+    "",
+]
+FOOTERS = [
+    "Esta mensagem e seus anexos são confidenciais e destinados exclusivamente ao destinatário. "
+    "Se você a recebeu por engano, apague-a e avise o remetente.",
+    "AVISO LEGAL: as informações contidas neste e-mail são sigilosas.",
+    "This e-mail and any attachments are confidential and intended solely for the intended recipient.",
+    "",
+]
+QUOTED_BODY = (
+    "Olá, conforme conversamos, o acesso foi liberado e o procedimento de recuperação de senha foi "
+    "atualizado no portal. Qualquer dúvida estamos à disposição para ajudar com o que precisar. "
+)
+
+
+def quoted_history(rng: random.Random, depth: int) -> str:
+    blocks = []
+    for level in range(depth):
+        style = rng.choice(["gmail_pt", "gmail_en", "outlook", "forward", "quote"])
+        body = QUOTED_BODY * rng.randint(1, 4)
+        if style == "gmail_pt":
+            blocks.append(
+                f"Em seg., {level + 1} de mar. de 2024 às 10:0{level}, Suporte <suporte@empresa.com>\nescreveu:\n"
+                + "\n".join("> " + line for line in body.split(". "))
+            )
+        elif style == "gmail_en":
+            blocks.append(
+                f"On Mon, Mar {level + 1}, 2024 at 10:00 AM Support <support@company.com> wrote:\n"
+                + "\n".join("> " + line for line in body.split(". "))
+            )
+        elif style == "outlook":
+            blocks.append(
+                "________________________________\nDe: Suporte <suporte@empresa.com>\n"
+                f"Enviado: segunda-feira, {level + 1} de março de 2024 10:00\nPara: Cliente\nAssunto: RE: Chamado\n\n"
+                + body
+            )
+        elif style == "forward":
+            blocks.append(
+                "---------- Forwarded message ---------\nFrom: Suporte <support@company.com>\n"
+                f"Date: Mon, Mar {level + 1}, 2024\nSubject: Chamado\nTo: <cliente@x.com>\n\n" + body
+            )
+        else:
+            blocks.append("-----Original Message-----\n" + "\n".join("> " + line for line in body.split(". ")))
+    return "\n\n".join(blocks)
+
+
+def make_email(rng: random.Random, n: int):
+    content = rng.choice(CONTENT).format(n=10000 + n)
+    parts = [rng.choice(GREETINGS), content, rng.choice(SIGNATURES), rng.choice(FOOTERS)]
+    depth = rng.choice([0, 1, 1, 2, 3])
+    if depth and rng.random() < 0.2:
+        # Resposta embaixo da citação (bottom-posting): o conteúdo novo fica depois do histórico
+        body = QUOTED_BODY * rng.randint(1, 4)
+        parts.insert(0, "Em seg., 4 de mar. de 2024, Suporte &lt;s@x.com&gt; escreveu:\n"
+                     + "\n".join("> " + line for line in body.split(". ")))
+    elif depth:
+        parts.append(quoted_history(rng, depth))
+    text = "\n\n".join(p for p in parts if p)
+    # Como em /classify: o classificador recebe o texto sanitizado
+    return sanitize_email_text(text), sanitize_email_text(content)
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pré-processamento de emails")
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--budget", type=int, default=128, help="Orçamento de tokens (CLASSIFY_TOKEN_BUDGET)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_email(rng, i) for i in range(args.emails)]
+    max_chars = args.budget * 4
+
+    for text, _ in corpus[:200]:
+        condense_email(text, args.budget)  # aquecimento (regex compiladas, caches)
+
+    timings, tokens_before, tokens_after = [], [], []
+    kept_before = kept_after = 0
+    quoted_after = 0
+    for text, content in corpus:
+        start = time.perf_counter()
+        condensed = condense_email(text, args.budget)
+        timings.append(time.perf_counter() - start)
+        baseline = text[:max_chars]
+        tokens_before.append(estimate_tokens(baseline))
+        tokens_after.append(estimate_tokens(condensed))
+        kept_before += content in baseline
+        kept_after += content in condensed
+        quoted_after += "acesso foi liberado" in condensed and "acesso foi liberado" not in content
+
+    sizes = [len(t) for t, _ in corpus]
+    total = len(corpus)
+    print(f"{total} emails, {statistics.mean(sizes):.0f} caracteres em média (máx {max(sizes)}), orçamento {args.budget} tokens")
+    print(
+        f"custo por email: média {statistics.mean(timings) * 1e6:.1f}µs  p50 {percentile(timings, 50) * 1e6:.1f}µs  "
+        f"p99 {percentile(timings, 99) * 1e6:.1f}µs  ({total / sum(timings):,.0f} emails/s em 1 núcleo)"
+    )
+    before, after = sum(tokens_before), sum(tokens_after)
+    print(
+        f"tokens do email no prompt: {before / total:.1f} -> {after / total:.1f} por email "
+        f"({(1 - after / before) * 100:.0f}% a menos)"
+    )
+    print(
+        f"conteúdo novo inteiro no prompt: corte em {max_chars} caracteres {kept_before / total:.1%}  "
+        f"pré-processado {kept_after / total:.1%}"
+    )
+    print(f"histórico citado que vazou para o prompt: {quoted_after / total:.1%}")
+
+    adversarial = {
+        "linha única": "a" * 5000,
+        "frases curtas sem quebra": "Texto qualquer. " * 312,
+        "linhas 'De:'": "De: x\n" * 833,
+        "linhas citadas": "&gt; texto citado\n" * 277,
+        "linhas 'escreveu:'": "Fulano escreveu:\n" * 294,
+        "rodapé sem fim": "Esta mensagem " + "x" * 4986,
+    }
+    print("entradas adversariais:")
+    for name, text in adversarial.items():
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            condense_email(text, args.budget)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {name:<32}{best * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
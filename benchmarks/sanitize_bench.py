@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Benchmark da sanitização: implementação antiga (10 re.sub com DOTALL) contra app.sanitizer,
+# com entradas comuns e adversariais (aberturas sem fechamento, UPDATE sem SET, "on" repetido).
+# O objetivo é garantir que o custo por request fica limitado mesmo antes do limite de 5000 caracteres.
+#
+# Uso: python benchmarks/sanitize_bench.py [--size 5000] [--skip-legacy]
+
+import argparse
+import html
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.sanitizer import sanitize_email_text
+
+LEGACY_PATTERNS = [
+    r"<script[^>]*>.*?</script>",
+    r"on\w+\s*=",
+    r"javascript:",
+    r"data:text/html",
+    r"DROP\s+TABLE",
+    r"DELETE\s+FROM",
+    r"INSERT\s+INTO",
+    r"UPDATE\s+.*\s+SET",
+    r"--",
+    r"/\*.*?\*/",
+]
+
+
+def legacy_sanitize(text: str) -> str:
+    text = text.strip()
+    for pattern in LEGACY_PATTERNS:
+        text = re.sub(pattern, "", text, flags=re.IGNORECASE | re.DOTALL)
+    text = html.escape(text, quote=True)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def make_inputs(size: int) -> dict:
+    normal = (
+        "Prezados, gostaria de verificar o status da minha solicitação #12345. "
+        "O sistema apresenta erro ao fazer login desde ontem.\n"
+    )
+    return {
+        "normal": (normal * (size // len(normal) + 1))[:size],
+        "html/sql misto": ("<b>oi</b> <script>alert(1)</script> DROP TABLE x; -- /* c */ " * size)[:size],
+        "script sem fechamento": ("<script>" * size)[:size],
+        "comentário sem fechamento": ("/*" * size)[:size],
+        "UPDATE sem SET": ("UPDATE " * size)[:size],
+        "UPDATE com espaços": "UPDATE a" + " " * (size - 8),
+        "on repetido": ("on" * size)[:size],
+    }
+
+
+def timed(fn, text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de sanitize_email_text")
+    parser.add_argument("--size", type=int, default=5000, help="Tamanho das entradas (caracteres)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Não medir a implementação antiga")
+    args = parser.parse_args()
+
+    print(f"{'entrada':<28}{'antigo (ms)':>14}{'novo (ms)':>12}")
+    worst = 0.0
+    for name, text in make_inputs(args.size).items():
+        legacy = "-" if args.skip_legacy else f"{timed(legacy_sanitize, text):.2f}"
+        new = timed(sanitize_email_text, text)
+        worst = max(worst, new)
+        print(f"{name:<28}{legacy:>14}{new:>12.2f}")
+
+    print(f"pior caso (novo): {worst:.2f} ms para {args.size} caracteres")
+
+
+if __name__ == "__main__":
+    main()
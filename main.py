@@ -1,23 +1,33 @@
 #!/usr/bin/env python3
-#classify agora retorna 503 enquanto os modelos estiverem carregando
+# /classify responde por keywords enquanto o Gemini carrega (503 só antes do startup)
 # Usa PORT da env (para ambientes como DigitalOcean Apps / Render)
 
 import os
 import sys
 import io
-import re
-import html
+import json
+import asyncio
 import logging
 import threading
+from datetime import datetime, timezone
 from pathlib import Path
-from io import BytesIO
 
-from fastapi import FastAPI, Form, UploadFile, File
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Form, UploadFile, File, Request
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-
-import PyPDF2
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as FormFile
+
+from app.assets import IMMUTABLE, REVALIDATE, StaticAssets
+from app.batch import parse_batch_payload
+from app.jobs import DONE, FAILED, JobFailed, JobQueue
+from app.logs import RequestIdMiddleware, configure_logging, logging_stats
+from app.metrics import CLASSIFICATIONS, ERRORS, REGISTRY, STAGE_SECONDS, gauge_lines
+from app.pdf import PdfTextTooLong, extract_text_from_pdf_async, shutdown_pool
+from app.pool import api_keys_from_env
+from app.sanitizer import sanitize_email_text
+from app.startup import STARTUP, lazy_import
+from app.uploads import TextTooLong, UploadLimitMiddleware, UploadTooLarge, read_upload_bytes, read_upload_text
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -25,7 +35,7 @@ load_dotenv()
 # Tente não importar EmailClassifier até carregar em background
 
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger("email-classifier")
 
 try:
@@ -51,12 +61,45 @@ BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "app" / "static"
 TEMPLATES_DIR = BASE_DIR / "app" / "templates"
 
-if STATIC_DIR.exists():
-    app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+# Interface (index, CSS, JS) na memória, pré-comprimida e com URLs versionadas pelo hash do conteúdo
+with STARTUP.phase("static_assets"):
+    STATIC_ASSETS = StaticAssets(STATIC_DIR)
+
+MAX_RAW_CHARS = int(os.getenv("SANITIZE_MAX_INPUT_CHARS", "50000"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(25 * 1024 * 1024)))
+BATCH_MAX_ITEMS = int(os.getenv("CLASSIFY_BATCH_MAX_ITEMS", "5000"))
+# Folga para os headers e boundaries do multipart além do próprio arquivo
+MULTIPART_OVERHEAD = 64 * 1024
+# /jobs aceita arquivos e lotes maiores: o processamento sai do ciclo request/response
+JOBS_MAX_BYTES = int(os.getenv("JOBS_MAX_BYTES", str(50 * 1024 * 1024)))
+JOBS_MAX_ITEMS = int(os.getenv("JOBS_MAX_ITEMS", "50000"))
+JOBS_CHUNK_SIZE = int(os.getenv("JOBS_CHUNK_SIZE", "200"))
+JOBS_SSE_INTERVAL = 0.5
+
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/classify": UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+        "/classify/batch": BATCH_MAX_BYTES,
+        "/jobs": JOBS_MAX_BYTES + MULTIPART_OVERHEAD,
+    },
+)
+# Por último: o middleware mais externo, o id vale para os logs de toda a requisição
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request: Request, exc: UploadTooLarge):
+
+    return JSONResponse(status_code=413, content={"error": exc.detail})
+
 
 classifier = None
+jobs = None
 _model_ready = False
 _model_lock = threading.Lock()
+_preloaded = False
 
 
 def is_ready() -> bool:
@@ -69,17 +112,43 @@ def set_ready(value: bool):
         _model_ready = value
 
 
-def load_models_background():
-
+def build_classifier():
+    # Parte barata do startup (keywords, cache, breaker): com ela /classify já responde por keywords
     global classifier
+    if classifier is None:
+        module = lazy_import("app.classifier")
+        with STARTUP.phase("EmailClassifier"):
+            classifier = module.EmailClassifier(lazy=True)
+        STARTUP.mark("keywords_ready")
+    return classifier
+
+
+def preload():
+    # Modo pre-fork (python -m app.prefork ou gunicorn --preload com PRELOAD_MODELS=1): monta no processo
+    # pai tudo que pode ser herdado pelos workers. O genai.Client fica para cada worker.
+    global _preloaded
+    build_classifier().init_local_model()
+    if api_keys_from_env():
+        try:
+            lazy_import("google.genai")
+            lazy_import("google.genai.types")
+        except ImportError:
+            pass
+    _preloaded = True
+    STARTUP.mark("preloaded")
+
+
+def load_models_background():
 
     try:
         logger.info("Carregando modelos de IA em background (pode demorar)...")
-        # Import dinâmico para reduzir impacto na importação do módulo
-        from app.classifier import EmailClassifier
-        classifier = EmailClassifier()
+        classifier.warm_up()
         set_ready(True)
-        logger.info("Modelos carregados com sucesso. Readiness OK.")
+        STARTUP.mark("ready")
+        # Jobs não têm pressa: os workers só começam com o Gemini pronto, para não cair em keywords
+        if jobs is not None:
+            jobs.start()
+        logger.info("Modelos carregados com sucesso. Readiness OK. Startup: %s", STARTUP.summary())
     except Exception as e:
         set_ready(False)
         logger.exception("Falha ao carregar modelos de IA: %s", e)
@@ -88,81 +157,40 @@ def load_models_background():
 @app.on_event("startup")
 def startup_event():
 
+    global jobs
+    build_classifier()
+    # A fila aceita jobs desde já; os workers começam quando os modelos ficam prontos.
+    # /jobs é opcional: sem JOBS_PATH ou com o SQLite inacessível o resto do serviço sobe assim mesmo
+    if os.getenv("JOBS_PATH", "jobs.db"):
+        try:
+            jobs = JobQueue.from_env({"classify": _run_classify_job, "batch": _run_batch_job})
+        except Exception as e:
+            logger.error("Fila de jobs desativada: falha ao abrir %s: %s", os.getenv("JOBS_PATH", "jobs.db"), e)
+            jobs = None
+    else:
+        logger.info("Fila de jobs desativada (JOBS_PATH vazio).")
+    if _preloaded:
+        # Imports já feitos no processo pai: criar o client leva milissegundos
+        load_models_background()
+        return
     logger.info("Startup: iniciando carregamento de modelos em background...")
     t = threading.Thread(target=load_models_background, daemon=True)
     t.start()
 
-def sanitize_email_text(text: str) -> str:
-
-    if text is None:
-        return ""
-
-    try:
-        if isinstance(text, bytes):
-            text = text.decode("utf-8", errors="replace")
-    except Exception:
-        text = str(text)
-
-    text = str(text).strip()
-    if not text:
-        return ""
-
-    dangerous_patterns = [
-        r"<script[^>]*>.*?</script>",
-        r"on\w+\s*=",
-        r"javascript:",
-        r"data:text/html",
-        r"DROP\s+TABLE",
-        r"DELETE\s+FROM",
-        r"INSERT\s+INTO",
-        r"UPDATE\s+.*\s+SET",
-        r"--",
-        r"/\*.*?\*/",
-    ]
-
-    for pattern in dangerous_patterns:
-        text = re.sub(pattern, "", text, flags=re.IGNORECASE | re.DOTALL)
-
-    text = html.escape(text, quote=True)
-
-    text = re.sub(r"\n{3,}", "\n\n", text)
 
-    return text
+@app.on_event("shutdown")
+def shutdown_event():
 
-
-def extract_text_from_pdf(pdf_content: bytes) -> str:
-
-    try:
-        pdf_file = BytesIO(pdf_content)
-        reader = PyPDF2.PdfReader(pdf_file)
-
-        if len(reader.pages) == 0:
-            logger.warning("PDF sem páginas.")
-            return ""
-
-        parts = []
-        for i, page in enumerate(reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    parts.append(page_text)
-                logger.debug("Página %d processada", i + 1)
-            except Exception as e:
-                logger.warning("Erro ao processar página %d: %s", i + 1, e)
-                continue
-
-        return "\n".join(parts).strip()
-    except Exception as e:
-        logger.exception("Erro ao extrair texto do PDF: %s", e)
-        return ""
+    if jobs is not None:
+        jobs.stop()
+    shutdown_pool()
 
 @app.get("/")
-async def root():
+async def root(request: Request):
 
     try:
-        fpath = STATIC_DIR / "index.html"
-        if fpath.exists():
-            return HTMLResponse(content=fpath.read_text(encoding="utf-8"))
+        if STATIC_ASSETS.index is not None:
+            return STATIC_ASSETS.response(request, STATIC_ASSETS.index)
         else:
             return HTMLResponse(content="<h1>Email Classifier AI</h1><p>Index não encontrado.</p>", status_code=200)
     except Exception as e:
@@ -170,6 +198,16 @@ async def root():
         return HTMLResponse(content="<h1>Erro interno</h1>", status_code=500)
 
 
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static_file(path: str, request: Request):
+
+    asset = STATIC_ASSETS.get(path)
+    if asset is None:
+        return JSONResponse(status_code=404, content={"error": "Arquivo não encontrado."})
+    # URL com hash: o conteúdo nunca muda; sem hash: revalida pelo ETag a cada uso
+    return STATIC_ASSETS.response(request, asset, IMMUTABLE if STATIC_ASSETS.is_hashed(path) else REVALIDATE)
+
+
 @app.get("/health")
 async def health_check():
 
@@ -184,10 +222,111 @@ async def readiness_check():
     return JSONResponse(status_code=503, content={"status": "loading", "message": "Modelos ainda carregando"})
 
 
+def _classifier_gauges():
+    # Estado dos caches, do circuit breaker, do limitador, do singleflight e das quase-duplicatas, lido na hora do scrape
+    if classifier is None:
+        return []
+    cache = classifier.cache.stats()
+    replies = classifier.replies.stats()
+    flights = classifier.singleflight.stats()
+    return (
+        gauge_lines("email_classifier_cache", "Estado do cache de classificações",
+                    {k: cache[k] for k in ("entries", "hits", "misses", "evictions")}, label="stat")
+        + gauge_lines("email_classifier_reply_cache", "Estado do cache de respostas geradas pela IA",
+                      {k: replies[k] for k in ("entries", "hits", "misses", "evictions")}, label="stat")
+        + _pool_gauges()
+        + gauge_lines("email_classifier_singleflight", "Chamadas líderes e coalescidas no singleflight",
+                      {k: flights[k] for k in ("leaders", "coalesced")}, label="stat")
+        + _neardup_gauges()
+        + _jobs_gauges()
+    )
+
+
+def _pool_gauges():
+    # Um valor por endpoint (chave/modelo) do pool do Gemini
+    if classifier.pool is None:
+        return []
+    endpoints = classifier.pool.stats()["endpoints"]
+    return (
+        gauge_lines("email_classifier_gemini_breaker_open", "1 se o circuit breaker do endpoint está aberto",
+                    {ep["endpoint"]: 1 if ep["circuit_breaker"]["state"] == "open" else 0 for ep in endpoints},
+                    label="endpoint")
+        + gauge_lines("email_classifier_gemini_concurrency_limit", "Limite de chamadas simultâneas (AIMD) por endpoint",
+                      {ep["endpoint"]: ep["limiter"]["limit"] for ep in endpoints}, label="endpoint")
+        + gauge_lines("email_classifier_gemini_in_flight", "Chamadas em andamento por endpoint",
+                      {ep["endpoint"]: ep["limiter"]["in_flight"] for ep in endpoints}, label="endpoint")
+        + gauge_lines("email_classifier_gemini_latency_seconds", "Latência média móvel das chamadas por endpoint",
+                      {ep["endpoint"]: (ep["latency_ms"] or 0) / 1000 for ep in endpoints}, label="endpoint")
+    )
+
+
+def _neardup_gauges():
+    if classifier.neardup is None:
+        return []
+    neardup = classifier.neardup.stats()
+    return gauge_lines("email_classifier_neardup", "Estado do índice de quase-duplicatas",
+                       {k: neardup[k] for k in ("entries", "hits", "misses", "evictions")}, label="stat")
+
+
+def _jobs_gauges():
+    if jobs is None:
+        return []
+    stats = jobs.stats()
+    return (
+        gauge_lines("email_classifier_jobs", "Jobs na fila por status", stats["jobs"], label="status")
+        + gauge_lines("email_classifier_jobs_workers", "Workers da fila de jobs vivos e mortos",
+                      {"alive": stats["workers_alive"], "dead": stats["workers_dead"]}, label="state")
+    )
+
+
+def _logging_gauges():
+    stats = logging_stats()
+    return gauge_lines("email_classifier_logs", "Fila de logs: registros pendentes e descartados",
+                       {k: stats[k] for k in ("queued", "dropped_queue_full", "sampled_out")}, label="stat")
+
+
+REGISTRY.add_collector(_classifier_gauges)
+REGISTRY.add_collector(_logging_gauges)
+
+
+@app.get("/metrics")
+async def metrics():
+
+    # Os coletores consultam o SQLite dos jobs: fora do event loop
+    return PlainTextResponse(await run_in_threadpool(REGISTRY.render), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def stats():
+
+    if classifier is None:
+        return JSONResponse(status_code=503, content={"status": "loading", "message": "Modelos ainda carregando"})
+    return {
+        "ready": is_ready(),
+        "startup": STARTUP.stats(),
+        "cache": classifier.cache.stats(),
+        "replies": {"contextual": classifier.contextual_reply, **classifier.replies.stats()},
+        "gemini": classifier.pool.stats() if classifier.pool else {"enabled": False},
+        "local_model": classifier.local_model.stats() if classifier.local_model else {"loaded": False},
+        "singleflight": classifier.singleflight.stats(),
+        "neardup": classifier.neardup.stats() if classifier.neardup else {"enabled": False},
+        "jobs": await run_in_threadpool(jobs.stats) if jobs else {"enabled": False},
+        "static": STATIC_ASSETS.stats(),
+        "logging": logging_stats(),
+    }
+
+
 @app.post("/classify")
 async def classify_email(email_text: str = Form(None), file: UploadFile = File(None)):
 
-    if not is_ready():
+    with STAGE_SECONDS.time("request"):
+        return await _classify_email(email_text, file)
+
+
+async def _classify_email(email_text, file):
+
+    # Enquanto o Gemini carrega, o classificador já responde por cache/keywords
+    if classifier is None:
         logger.info("Request de /classify recusado: modelos ainda carregando")
         return JSONResponse(status_code=503, content={"error": "Serviço iniciando — modelos ainda carregando. Tente novamente em alguns instantes."})
 
@@ -203,56 +342,387 @@ async def classify_email(email_text: str = Form(None), file: UploadFile = File(N
         if ext not in {".txt", ".pdf"}:
             return JSONResponse(status_code=400, content={"error": "Tipo de arquivo inválido. Use .txt ou .pdf."})
 
+        stage = "upload_read"
         try:
-            raw = await file.read()
             if ext == ".txt":
-                email_text = raw.decode("utf-8", errors="replace")
+                with STAGE_SECONDS.time(stage):
+                    email_text = await read_upload_text(file, UPLOAD_MAX_BYTES, MAX_RAW_CHARS)
             else:
-                email_text = extract_text_from_pdf(raw)
+                with STAGE_SECONDS.time(stage):
+                    raw = await read_upload_bytes(file, UPLOAD_MAX_BYTES)
+                stage = "pdf_extract"
+                with STAGE_SECONDS.time(stage):
+                    email_text = await extract_text_from_pdf_async(raw, max_chars=MAX_RAW_CHARS)
                 if not email_text:
                     return JSONResponse(status_code=400, content={"error": "Não foi possível extrair texto do PDF."})
+        except UploadTooLarge as e:
+            ERRORS.inc(stage, type(e).__name__)
+            return JSONResponse(status_code=413, content={"error": e.detail})
+        except (TextTooLong, PdfTextTooLong):
+            # Leitura e extração param no limite do texto bruto de _prepare_text: arquivos são aceitos ou
+            # recusados como o mesmo texto enviado no formulário, nunca cortados
+            return JSONResponse(status_code=400, content={"error": "Email muito longo. Máximo 5000 caracteres."})
         except Exception as e:
+            ERRORS.inc(stage, type(e).__name__)
             logger.exception("Erro lendo arquivo: %s", e)
             return JSONResponse(status_code=400, content={"error": f"Erro ao processar arquivo: {str(e)}"})
 
-    email_text = sanitize_email_text(email_text) if email_text else ""
-    if not email_text:
-        return JSONResponse(status_code=400, content={"error": "O email está vazio após processamento."})
-
-    if len(email_text) < 10:
-        return JSONResponse(status_code=400, content={"error": "Email muito curto. Forneça pelo menos 10 caracteres."})
-
-    if len(email_text) > 5000:
-        return JSONResponse(status_code=400, content={"error": "Email muito longo. Máximo 5000 caracteres."})
+    email_text, erro = _prepare_text(email_text)
+    if erro:
+        return JSONResponse(status_code=400, content={"error": erro})
 
     try:
-        result = classifier.classify(email_text)
+        with STAGE_SECONDS.time("classify"):
+            result = await classifier.classify_async(email_text)
         categoria = result.get("categoria")
         confianca = result.get("confianca")
+        CLASSIFICATIONS.inc(result.get("metodo") or "desconhecido")
     except ValueError as ve:
+        ERRORS.inc("classify", type(ve).__name__)
         logger.warning("Validação do classifier: %s", ve)
         return JSONResponse(status_code=400, content={"error": str(ve)})
     except Exception as e:
+        ERRORS.inc("classify", type(e).__name__)
         logger.exception("Erro ao classificar: %s", e)
         return JSONResponse(status_code=500, content={"error": "Erro ao processar a classificação."})
 
+    payload = await _classification_payload(email_text, result)
+    return JSONResponse(status_code=200, content=payload, media_type="application/json; charset=utf-8")
+
+
+def _prepare_text(email_text):
+    # Validação comum a /classify e aos jobs: devolve (texto sanitizado, None) ou (None, mensagem de erro)
+
+    # Texto bruto muito acima do limite nem passa pela sanitização: mantém o custo por request limitado
+    if email_text and len(email_text) > MAX_RAW_CHARS:
+        return None, "Email muito longo. Máximo 5000 caracteres."
+
+    with STAGE_SECONDS.time("sanitize"):
+        email_text = sanitize_email_text(email_text) if email_text else ""
+    if not email_text:
+        return None, "O email está vazio após processamento."
+
+    if len(email_text) < 10:
+        return None, "Email muito curto. Forneça pelo menos 10 caracteres."
+
+    if len(email_text) > 5000:
+        return None, "Email muito longo. Máximo 5000 caracteres."
+
+    return email_text, None
+
+
+async def _classification_payload(email_text, result):
+
     try:
-        resposta = classifier.generate_response(categoria, email_text)
-    except Exception:
+        with STAGE_SECONDS.time("generate_response"):
+            resposta = await classifier.generate_response_async(result.get("categoria"), email_text)
+    except Exception as e:
+        ERRORS.inc("generate_response", type(e).__name__)
         logger.exception("Erro ao gerar resposta automática")
         resposta = "Obrigado pelo contato! Estamos analisando sua solicitação."
 
     payload = {
         "sucesso": True,
-        "categoria": categoria,
-        "confianca": confianca,
+        "categoria": result.get("categoria"),
+        "confianca": result.get("confianca"),
+        "metodo": result.get("metodo"),
         "resposta_automatica": resposta,
         "email_preview": (email_text[:200] + "...") if len(email_text) > 200 else email_text
     }
+    if "similaridade" in result:
+        payload["similaridade"] = result["similaridade"]
+    return payload
+
+@app.post("/classify/batch")
+async def classify_batch(request: Request):
+
+    if classifier is None:
+        logger.info("Request de /classify/batch recusado: modelos ainda carregando")
+        return JSONResponse(status_code=503, content={"error": "Serviço iniciando — modelos ainda carregando. Tente novamente em alguns instantes."})
+
+    # Parsing e sanitização de um lote cheio custam segundos de CPU: fora do event loop
+    try:
+        items = await run_in_threadpool(parse_batch_payload, await request.body())
+    except ValueError as ve:
+        return JSONResponse(status_code=400, content={"error": str(ve)})
+
+    if len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"Lote muito grande. Máximo {BATCH_MAX_ITEMS} emails."})
+
+    erros, validos = await run_in_threadpool(_validate_batch_items, items)
+
+    try:
+        classificados = await classifier.classify_batch_async(validos)
+    except Exception as e:
+        logger.exception("Erro ao classificar lote: %s", e)
+        return JSONResponse(status_code=500, content={"error": "Erro ao processar a classificação."})
+
+    payload = {"sucesso": True, "total": len(items), "resultados": _batch_results(items, erros, classificados)}
     return JSONResponse(status_code=200, content=payload, media_type="application/json; charset=utf-8")
 
+
+def _validate_batch_items(items):
+
+    erros = {}
+    validos = []
+    for item in items:
+        if len(item["email_text"]) > MAX_RAW_CHARS:
+            erros[item["id"]] = "Email muito longo. Máximo 5000 caracteres."
+            continue
+        text = sanitize_email_text(item["email_text"])
+        if len(text) < 10:
+            erros[item["id"]] = "Email muito curto. Forneça pelo menos 10 caracteres."
+        elif len(text) > 5000:
+            erros[item["id"]] = "Email muito longo. Máximo 5000 caracteres."
+        else:
+            validos.append({"id": item["id"], "email_text": text})
+    return erros, validos
+
+
+def _batch_results(items, erros, classificados):
+
+    resultados = []
+    for item in items:
+        if item["id"] in erros:
+            resultados.append({"id": item["id"], "sucesso": False, "error": erros[item["id"]]})
+            continue
+
+        result = classificados[item["id"]]
+        try:
+            resposta = classifier.generate_response(result.get("categoria"))
+        except Exception:
+            logger.exception("Erro ao gerar resposta automática")
+            resposta = "Obrigado pelo contato! Estamos analisando sua solicitação."
+
+        entry = {
+            "id": item["id"],
+            "sucesso": True,
+            "categoria": result.get("categoria"),
+            "confianca": result.get("confianca"),
+            "metodo": result.get("metodo"),
+            "resposta_automatica": resposta,
+        }
+        if "similaridade" in result:
+            entry["similaridade"] = result["similaridade"]
+        resultados.append(entry)
+    return resultados
+
+async def _run_classify_job(payload, meta, progress):
+    # Executado por um worker da fila, no event loop da thread do worker
+
+    progress(0, 1)
+    if meta.get("tipo") == "pdf":
+        try:
+            with STAGE_SECONDS.time("pdf_extract"):
+                email_text = await extract_text_from_pdf_async(payload, max_chars=MAX_RAW_CHARS)
+        except PdfTextTooLong:
+            raise JobFailed("Email muito longo. Máximo 5000 caracteres.")
+        if not email_text:
+            raise JobFailed("Não foi possível extrair texto do PDF.")
+    else:
+        email_text = payload.decode("utf-8")
+
+    email_text, erro = _prepare_text(email_text)
+    if erro:
+        raise JobFailed(erro)
+
+    try:
+        with STAGE_SECONDS.time("classify"):
+            result = await classifier.classify_async(email_text)
+    except ValueError as ve:
+        raise JobFailed(str(ve))
+    CLASSIFICATIONS.inc(result.get("metodo") or "desconhecido")
+    progress(1, 1)
+    return await _classification_payload(email_text, result)
+
+
+async def _run_batch_job(payload, meta, progress):
+    # Classifica em blocos de JOBS_CHUNK_SIZE para o progresso avançar durante lotes grandes
+
+    items = json.loads(payload)
+    erros, validos = _validate_batch_items(items)
+    classificados = {}
+    progress(0, len(validos))
+    for start in range(0, len(validos), JOBS_CHUNK_SIZE):
+        chunk = validos[start:start + JOBS_CHUNK_SIZE]
+        classificados.update(await classifier.classify_batch_async(chunk))
+        progress(start + len(chunk), len(validos))
+    return {"sucesso": True, "total": len(items), "resultados": _batch_results(items, erros, classificados)}
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds") if ts else None
+
+
+def _job_status(job):
+
+    status = {
+        "job_id": job["id"],
+        "tipo": job["kind"],
+        "status": job["status"],
+        "prioridade": job["priority"],
+        "progresso": {"concluidos": job["done"], "total": job["total"]},
+        "tentativas": job["attempts"],
+        "criado_em": _iso(job["created_at"]),
+        "iniciado_em": _iso(job["started_at"]),
+        "finalizado_em": _iso(job["finished_at"]),
+        "expira_em": _iso(job["expires_at"]),
+    }
+    if job["error"]:
+        status["error"] = job["error"]
+    return status
+
+
+def _job_not_found():
+    return JSONResponse(status_code=404, content={"error": "Job não encontrado ou expirado."})
+
+
+@app.post("/jobs")
+async def submit_job(request: Request):
+
+    if jobs is None:
+        if classifier is None:
+            return JSONResponse(status_code=503, content={"error": "Serviço iniciando — modelos ainda carregando. Tente novamente em alguns instantes."})
+        return JSONResponse(status_code=503, content={"error": "Fila de jobs indisponível."})
+
+    try:
+        priority = int(request.query_params.get("priority", "0"))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Prioridade inválida. Use um número inteiro."})
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        # Um email (texto, .txt ou .pdf), como em /classify
+        form = await request.form()
+        email_text = form.get("email_text")
+        file = form.get("file")
+        file = file if isinstance(file, FormFile) and file.filename else None
+        if email_text and file:
+            return JSONResponse(status_code=400, content={"error": "Envie apenas texto ou um arquivo, não ambos."})
+        if not email_text and not file:
+            return JSONResponse(status_code=400, content={"error": "Envie texto ou um arquivo (.txt ou .pdf)."})
+
+        kind, tipo = "classify", "text"
+        try:
+            if file:
+                ext = Path(file.filename).suffix.lower()
+                if ext not in {".txt", ".pdf"}:
+                    return JSONResponse(status_code=400, content={"error": "Tipo de arquivo inválido. Use .txt ou .pdf."})
+                if ext == ".pdf":
+                    tipo = "pdf"
+                    payload = await read_upload_bytes(file, JOBS_MAX_BYTES)
+                else:
+                    email_text = await read_upload_text(file, JOBS_MAX_BYTES, MAX_RAW_CHARS)
+        except UploadTooLarge as e:
+            return JSONResponse(status_code=413, content={"error": e.detail})
+        except TextTooLong:
+            return JSONResponse(status_code=400, content={"error": "Email muito longo. Máximo 5000 caracteres."})
+
+        if tipo == "text":
+            # Texto é validado já na submissão; só o PDF depende da extração no worker. O payload guarda o
+            # texto original: o worker sanitiza uma única vez, como /classify (sanitizar de novo escaparia
+            # o HTML duas vezes)
+            _, erro = _prepare_text(email_text)
+            if erro:
+                return JSONResponse(status_code=400, content={"error": erro})
+            payload = email_text.encode("utf-8")
+        meta = {"tipo": tipo}
+    else:
+        # Lote no mesmo formato de /classify/batch
+        try:
+            items = await run_in_threadpool(parse_batch_payload, await request.body())
+        except ValueError as ve:
+            return JSONResponse(status_code=400, content={"error": str(ve)})
+        if len(items) > JOBS_MAX_ITEMS:
+            return JSONResponse(status_code=400, content={"error": f"Lote muito grande. Máximo {JOBS_MAX_ITEMS} emails."})
+        kind, meta = "batch", {}
+        payload = json.dumps(items, ensure_ascii=False).encode("utf-8")
+
+    job = await run_in_threadpool(jobs.submit, kind, payload, meta, priority)
+    job_id = job["id"]
+    return JSONResponse(status_code=202, content={
+        "sucesso": True,
+        "job_id": job_id,
+        "status": job["status"],
+        "prioridade": job["priority"],
+        "deduplicado": job["deduplicated"],
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result",
+        "events_url": f"/jobs/{job_id}/events",
+    })
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+
+    job = await run_in_threadpool(jobs.get, job_id) if jobs else None
+    if job is None:
+        return _job_not_found()
+    return _job_status(job)
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+
+    job = await run_in_threadpool(jobs.get, job_id, True) if jobs else None
+    if job is None:
+        return _job_not_found()
+    if job["status"] == DONE:
+        return JSONResponse(status_code=200, content=job["result"], media_type="application/json; charset=utf-8")
+    if job["status"] == FAILED:
+        return JSONResponse(status_code=job["error_status"] or 500, content={"error": job["error"]})
+    # Ainda na fila ou em andamento
+    return JSONResponse(status_code=202, content=_job_status(job))
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    # Server-Sent Events: "progress" a cada mudança de status/progresso e "done"/"failed" no fim
+
+    if jobs is None or await run_in_threadpool(jobs.get, job_id) is None:
+        return _job_not_found()
+
+    async def stream():
+        last = None
+        idle = 0.0
+        while True:
+            job = await run_in_threadpool(jobs.get, job_id, True)
+            if job is None:
+                yield _sse("failed", {"job_id": job_id, "error": "Job não encontrado ou expirado."})
+                return
+            status = _job_status(job)
+            if job["status"] in (DONE, FAILED):
+                if job["status"] == DONE:
+                    status["resultado"] = job["result"]
+                yield _sse(job["status"], status)
+                return
+            key = (job["status"], job["done"], job["total"])
+            if key != last:
+                last, idle = key, 0.0
+                yield _sse("progress", status)
+            elif idle >= 15:
+                # Comentário para proxies não derrubarem a conexão ociosa
+                idle = 0.0
+                yield ": ping\n\n"
+            await asyncio.sleep(JOBS_SSE_INTERVAL)
+            idle += JOBS_SSE_INTERVAL
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if os.getenv("PRELOAD_MODELS") == "1":
+    preload()
+
+STARTUP.mark("app_imported")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8000"))
     logger.info("Executando localmente em http://0.0.0.0:%s", port)
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_config=None)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["JOBS_PATH"] = os.path.join(_tmp.name, "jobs.db")
+# Sem chave: classificação por keywords, sem rede
+os.environ.pop("GOOGLE_API_KEY", None)
+os.environ.pop("GOOGLE_API_KEYS", None)
+
+from fastapi.testclient import TestClient
+
+import main
+from pdf_bench import make_pdf
+
+EMAIL = "Preciso de ajuda: o relatório A & B <urgente> não abre no sistema, podem verificar?"
+
+
+class ApiTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(main.app)
+        cls.client.__enter__()
+        deadline = time.monotonic() + 10
+        while cls.client.get("/ready").status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Serviço não ficou pronto")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+
+    def job_result(self, **kwargs):
+        resp = self.client.post("/jobs", **kwargs)
+        self.assertEqual(resp.status_code, 202, resp.text)
+        deadline = time.monotonic() + 10
+        while True:
+            result = self.client.get(resp.json()["result_url"])
+            if result.status_code != 202 or time.monotonic() > deadline:
+                return result
+            time.sleep(0.05)
+
+
+class JobsTest(ApiTestCase):
+    def test_text_job_matches_classify(self):
+        direct = self.client.post("/classify", data={"email_text": EMAIL})
+        job = self.job_result(data={"email_text": EMAIL})
+        self.assertEqual(direct.status_code, 200)
+        self.assertEqual(job.status_code, 200, job.text)
+        # resposta_automatica é sorteada entre modelos de resposta; o resto tem de ser idêntico
+        for field in ("categoria", "confianca", "metodo", "email_preview"):
+            self.assertEqual(job.json()[field], direct.json()[field], field)
+        self.assertNotIn("&amp;amp;", job.json()["email_preview"])
+
+    def test_unknown_job_and_invalid_priority(self):
+        self.assertEqual(self.client.get("/jobs/inexistente").status_code, 404)
+        self.assertEqual(self.client.get("/jobs/inexistente/result").status_code, 404)
+        resp = self.client.post("/jobs?priority=alta", data={"email_text": EMAIL})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_identical_submission_is_deduplicated(self):
+        text = EMAIL + " (deduplicação)"
+        first = self.client.post("/jobs", data={"email_text": text}).json()
+        second = self.client.post("/jobs", data={"email_text": text}).json()
+        self.assertFalse(first["deduplicado"])
+        self.assertTrue(second["deduplicado"])
+        self.assertEqual(second["job_id"], first["job_id"])
+
+    def test_batch_job_matches_classify_batch(self):
+        batch = '[{"id": "a", "email_text": "Preciso de suporte com a fatura em aberto"}, "Parabéns pelo aniversário!", "curto"]'
+        direct = self.client.post("/classify/batch", content=batch)
+        job = self.job_result(content=batch)
+        self.assertEqual(job.status_code, 200, job.text)
+        strip = lambda rows: [{k: v for k, v in row.items() if k != "resposta_automatica"} for row in rows]
+        self.assertEqual(strip(job.json()["resultados"]), strip(direct.json()["resultados"]))
+
+    def test_escaping_near_limit_does_not_fail_job(self):
+        # Cabe no limite depois de sanitizado uma vez; sanitizado duas vezes passaria de 5000
+        text = "Preciso de suporte com o relatório A & B. " * 10
+        text += "x" * (4940 - len(text))
+        self.assertEqual(self.client.post("/classify", data={"email_text": text}).status_code, 200)
+        self.assertEqual(self.job_result(data={"email_text": text}).status_code, 200)
+
+
+class UploadLimitsTest(ApiTestCase):
+    # Um .txt é aceito ou recusado exatamente como o mesmo texto enviado no formulário
+
+    def assert_same_as_form(self, text, status):
+        form = self.client.post("/classify", data={"email_text": text})
+        upload = self.client.post("/classify", files={"file": ("email.txt", text.encode(), "text/plain")})
+        self.assertEqual(form.status_code, status, form.text)
+        self.assertEqual(upload.status_code, status, upload.text)
+        if status == 400:
+            self.assertEqual(upload.json(), form.json())
+
+    def test_long_txt_is_rejected(self):
+        self.assert_same_as_form("Preciso de ajuda com o sistema. " * 400, 400)
+
+    def test_long_txt_with_signatures_is_rejected(self):
+        # Cortado em 5001 caracteres antes da sanitização, ficava com menos de 5000 e passava
+        self.assert_same_as_form("Preciso de ajuda com o sistema.\n-- \n" * 400, 400)
+
+    def test_txt_that_shrinks_when_sanitized_is_accepted(self):
+        self.assert_same_as_form("Preciso de ajuda com o sistema." + "\n" * 6000 + "Obrigado.", 200)
+
+    def test_txt_over_raw_limit(self):
+        files = {"file": ("email.txt", b"a" * (main.MAX_RAW_CHARS + 1), "text/plain")}
+        self.assertEqual(self.client.post("/classify", files=files).status_code, 400)
+        self.assertEqual(self.client.post("/jobs", files=files).status_code, 400)
+
+
+class PdfLimitsTest(ApiTestCase):
+    # PDFs longos são recusados por inteiro, em /classify e em /jobs, seja qual for o ponto em que a extração para
+
+    def assert_rejected(self, pdf):
+        files = {"file": ("email.pdf", pdf, "application/pdf")}
+        resp = self.client.post("/classify", files=files)
+        self.assertEqual(resp.status_code, 400, resp.text)
+        self.assertEqual(resp.json()["error"], "Email muito longo. Máximo 5000 caracteres.")
+        job = self.job_result(files=files)
+        self.assertEqual(job.status_code, 400, job.text)
+        self.assertEqual(job.json(), resp.json())
+
+    def test_short_pdf_is_accepted(self):
+        files = {"file": ("email.pdf", make_pdf(2, 3), "application/pdf")}
+        self.assertEqual(self.client.post("/classify", files=files).status_code, 200)
+        self.assertEqual(self.job_result(files=files).status_code, 200)
+
+    def test_pdf_over_sanitized_limit_is_rejected(self):
+        self.assert_rejected(make_pdf(20, 5))
+
+    def test_pdf_that_shrank_after_the_cut_is_rejected(self):
+        # Sanitizado por inteiro passa de 8000 caracteres; o corte antigo em 5001 ficava abaixo de 5000
+        self.assert_rejected(make_pdf(30, 5, line="Preciso de ajuda -- o sistema financeiro não abre."))
+
+    def test_pdf_over_raw_limit_is_rejected(self):
+        self.assert_rejected(make_pdf(200, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
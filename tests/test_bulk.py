@@ -0,0 +1,81 @@
+import sys
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.bulk import SharedRateGate
+from app.pool import ClientPool
+
+
+class CountingGate:
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+
+class FakeModels:
+    # Cliente síncrono: responde sempre 503 (API fora) ou uma classificação válida
+    def __init__(self, down: bool):
+        self.down = down
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        import httpx
+        from google.genai.errors import ServerError
+
+        self.calls += 1
+        if self.down:
+            raise ServerError(503, httpx.Response(503, json={"error": {"message": "indisponível", "status": "UNAVAILABLE"}}))
+        return SimpleNamespace(text='{"categoria": "Produtivo", "confianca": 0.9, "resposta": "Vamos verificar."}')
+
+
+def _classifier(models, gate):
+    from app.classifier import EmailClassifier
+
+    classifier = EmailClassifier(lazy=True)
+    client = SimpleNamespace(models=models)
+    classifier.pool = ClientPool(["fake"], ["modelo"], lambda key: client)
+    classifier.ia_api_available = True
+    classifier.base_delay = 0
+    classifier.rate_gate = gate
+    return classifier
+
+
+class RateGateTest(unittest.TestCase):
+    def test_gate_is_taken_once_per_api_call(self):
+        gate = CountingGate()
+        models = FakeModels(down=False)
+        classifier = _classifier(models, gate)
+        for i in range(3):
+            self.assertIsNotNone(classifier._classify_via_api(f"Preciso de ajuda com o chamado {i}"))
+        self.assertEqual(gate.waits, models.calls)
+
+    def test_open_breaker_falls_back_without_rate_slots(self):
+        gate = CountingGate()
+        models = FakeModels(down=True)
+        classifier = _classifier(models, gate)
+        endpoint = classifier.pool.endpoints[0]
+        for _ in range(endpoint.breaker.failure_threshold):
+            endpoint.breaker.record_failure()
+
+        for i in range(20):
+            self.assertIsNone(classifier._classify_via_api(f"Preciso de ajuda com o chamado {i}"))
+        self.assertEqual(gate.waits, 0)
+        self.assertEqual(models.calls, 0)
+
+    def test_dead_api_is_not_paced_by_rate(self):
+        # Com a API fora o breaker abre nas primeiras chamadas; dali em diante o fallback não espera pelo --rate
+        classifier = _classifier(FakeModels(down=True), SharedRateGate(rate=5))
+        start = time.monotonic()
+        for i in range(40):
+            classifier.classify(f"Preciso de ajuda urgente com o chamado número {i} do sistema")
+        self.assertLess(time.monotonic() - start, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
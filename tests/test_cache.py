@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cache import ClassificationCache
+
+VALUE = {"categoria": "Produtivo", "confianca": 93.0}
+
+
+class PersistentCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "cache.db")
+        self.cache = ClassificationCache(db_path=self.path)
+
+    def test_disk_hit_after_restart(self):
+        self.cache.set("a", VALUE)
+        self.assertTrue(self.cache._db.flush(2))
+        fresh = ClassificationCache(db_path=self.path)
+        self.assertEqual(fresh.get("a"), VALUE)
+        self.assertIsNone(fresh.get("b"))
+        stats = fresh.stats()
+        self.assertEqual((stats["disk_hits"], stats["misses"]), (1, 1))
+
+    def test_read_does_not_wait_for_writer_lock(self):
+        # O lock de escrita preso (commit lento, disco travado) não atrasa uma leitura
+        self.cache.set("a", VALUE)
+        self.cache._db.flush(2)
+        self.cache._entries.clear()
+        results = []
+        with self.cache._db._lock:
+            reader = threading.Thread(target=lambda: results.append(self.cache.get("a")))
+            reader.start()
+            reader.join(0.5)
+            finished = not reader.is_alive()
+        reader.join(2)
+        self.assertTrue(finished)
+        self.assertEqual(results, [VALUE])
+
+    def test_lru_lock_is_free_during_disk_read(self):
+        self.cache.set("memoria", VALUE)
+        reading, release = threading.Event(), threading.Event()
+        disk_get = self.cache._disk_get
+
+        def slow_disk_get(key):
+            reading.set()
+            release.wait(2)
+            return disk_get(key)
+
+        with mock.patch.object(self.cache, "_disk_get", slow_disk_get):
+            reader = threading.Thread(target=self.cache.get, args=("disco",))
+            reader.start()
+            self.assertTrue(reading.wait(2))
+            start = time.perf_counter()
+            self.assertEqual(self.cache.get("memoria"), VALUE)
+            self.cache.set("outra", VALUE)
+            self.assertLess(time.perf_counter() - start, 0.5)
+            release.set()
+            reader.join(2)
+
+    def test_get_async_keeps_event_loop_free(self):
+        def slow_disk_get(key):
+            time.sleep(0.3)
+            return None
+
+        async def measure():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0)
+            self.assertIsNone(await self.cache.get_async("ausente"))
+            task.cancel()
+            return ticks
+
+        with mock.patch.object(self.cache, "_disk_get", slow_disk_get):
+            self.assertGreater(asyncio.run(measure()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import jobs as jobs_module
+from app.jobs import DONE, JobQueue
+
+
+async def _echo(payload, meta, progress):
+    progress(1, 1)
+    return {"texto": payload.decode()}
+
+
+class FastLockQueue(JobQueue):
+    # Desiste de esperar por um lock do SQLite em 50ms, em vez dos 10s de produção
+    def _connect(self) -> sqlite3.Connection:
+        db = super()._connect()
+        db.execute("PRAGMA busy_timeout = 50")
+        return db
+
+
+class JobWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "jobs.db")
+        patcher = mock.patch.object(jobs_module, "ERROR_BACKOFF", 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = FastLockQueue(self.path, {"echo": _echo}, workers=1, poll_interval=0.05)
+        self.addCleanup(self.queue.stop, 2)
+
+    def wait_status(self, job_id, status, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.queue.get(job_id)
+            if job and job["status"] == status:
+                return job
+            time.sleep(0.02)
+        self.fail(f"Job {job_id} não chegou a {status}: {self.queue.get(job_id)}")
+
+    def test_worker_survives_locked_database(self):
+        job = self.queue.submit("echo", b"ok")
+        # Outro processo segurando o lock de escrita: o BEGIN IMMEDIATE do worker falha com "database is locked"
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        self.queue.start()
+        time.sleep(0.3)
+        other.execute("ROLLBACK")
+        other.close()
+
+        self.wait_status(job["id"], DONE)
+        stats = self.queue.stats()
+        self.assertGreater(stats["db_errors"], 0)
+        self.assertEqual(stats["workers_alive"], 1)
+        self.assertEqual(stats["workers_dead"], 0)
+
+    def test_worker_survives_failed_finish(self):
+        job = self.queue.submit("echo", b"ok")
+        finish = self.queue._finish
+        # Falha mesmo depois das novas tentativas internas de _finish
+        failures = [sqlite3.OperationalError("disk I/O error")]
+
+        def flaky_finish(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return finish(*args, **kwargs)
+
+        with mock.patch.object(self.queue, "_finish", flaky_finish):
+            self.queue.start()
+            second = self.queue.submit("echo", b"segundo")
+            self.wait_status(second["id"], DONE)
+        self.assertEqual(self.queue.stats()["workers_alive"], 1)
+        # O primeiro job ficou em andamento: volta para a fila quando o lease vencer
+        self.assertEqual(self.queue.get(job["id"])["status"], "running")
+
+    def test_dead_worker_is_reported(self):
+        with mock.patch.object(self.queue, "_maintenance", side_effect=RuntimeError("bug")):
+            self.queue.start()
+            self.queue._threads[0].join(2)
+        stats = self.queue.stats()
+        self.assertEqual(stats["workers_alive"], 0)
+        self.assertEqual(stats["workers_dead"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
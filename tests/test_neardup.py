@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.neardup import NearDuplicateIndex
+
+EMAIL = ("Olá, equipe. O pedido {n} da cliente Maria continua sem atualização no portal financeiro desde a "
+         "semana passada. Podem verificar o status e me retornar com uma previsão de entrega? Obrigado.")
+RESULT = {"categoria": "Produtivo", "confianca": 91.0}
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+    def test_email_differing_in_numbers_reuses_result(self):
+        index = NearDuplicateIndex()
+        index.add(EMAIL.format(n=48213), RESULT)
+        found = index.lookup(EMAIL.format(n=99107))
+        self.assertIsNotNone(found)
+        value, similaridade = found
+        self.assertEqual(value, RESULT)
+        self.assertGreaterEqual(similaridade, index.threshold)
+
+    def test_different_email_is_not_a_match(self):
+        index = NearDuplicateIndex()
+        index.add(EMAIL.format(n=48213), RESULT)
+        self.assertIsNone(index.lookup("Feliz aniversário! Desejo a todos do time um ótimo fim de semana com a família."))
+
+    def test_short_text_is_ignored(self):
+        index = NearDuplicateIndex()
+        index.add("Obrigado!", RESULT)
+        self.assertEqual(index.stats()["entries"], 0)
+
+    def test_persists_per_namespace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "neardup.db")
+            index = NearDuplicateIndex(db_path=path, namespace="modelo:v1")
+            index.add(EMAIL.format(n=1), RESULT)
+            self.assertTrue(index._db.flush(2))
+
+            self.assertIsNotNone(NearDuplicateIndex(db_path=path, namespace="modelo:v1").lookup(EMAIL.format(n=2)))
+            # Outro modelo/prompt não reaproveita classificações
+            self.assertIsNone(NearDuplicateIndex(db_path=path, namespace="modelo:v2").lookup(EMAIL.format(n=2)))
+
+            index.clear()
+            self.assertIsNone(NearDuplicateIndex(db_path=path, namespace="modelo:v1").lookup(EMAIL.format(n=2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.pool import ClientPool
+
+
+def _throttled():
+    import httpx
+    from google.genai.errors import ClientError
+
+    # 429 sem Retry-After nem retryDelay
+    return ClientError(429, httpx.Response(429, json={"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}}))
+
+
+class FakeModels:
+    def __init__(self, throttled: bool, latency: float = 0.02):
+        self.throttled = throttled
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.throttled:
+            raise _throttled()
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text="Produtivo")
+
+
+def _pool(models):
+    # Uma chave por FakeModels, todas no mesmo modelo; key1 é a primeira no desempate
+    clients = {f"k{i}": SimpleNamespace(aio=SimpleNamespace(models=m)) for i, m in enumerate(models)}
+    return ClientPool(list(clients), ["modelo"], lambda key: clients[key])
+
+
+class EndpointScoreTest(unittest.TestCase):
+    def test_throttle_without_retry_after_moves_endpoint_last(self):
+        pool = _pool([FakeModels(True), FakeModels(False)])
+        first, second = pool.endpoints
+        second.record_success(1.2)
+        first.record_failure(throttled=True)
+        self.assertTrue(first.cooling_down())
+        self.assertEqual(pool._candidates(()), [second, first])
+
+    def test_throttle_with_retry_after_has_no_cooldown(self):
+        pool = _pool([FakeModels(True)])
+        endpoint = pool.endpoints[0]
+        endpoint.record_failure(throttled=True, retry_after=3)
+        self.assertFalse(endpoint.cooling_down())
+
+    def test_failures_raise_score(self):
+        pool = _pool([FakeModels(False), FakeModels(False)])
+        failing, healthy = pool.endpoints
+        failing.record_failure()
+        healthy.record_success(0.3)
+        self.assertGreater(failing.score(), healthy.score())
+        self.assertEqual(pool._candidates(())[0], healthy)
+
+
+class ThrottledEndpointTest(unittest.TestCase):
+    def setUp(self):
+        from app.classifier import EmailClassifier
+
+        self.throttled, self.healthy = FakeModels(True), FakeModels(False)
+        self.classifier = EmailClassifier(lazy=True)
+        self.classifier.pool = _pool([self.throttled, self.healthy])
+
+    def test_throttled_endpoint_is_not_picked_first_again(self):
+        async def requests():
+            return [await self.classifier._generate_async(f"prompt {i}") for i in range(5)]
+
+        responses = asyncio.run(requests())
+        self.assertTrue(all(resp is not None for resp in responses))
+        self.assertEqual(self.throttled.calls, 1)
+        self.assertEqual(self.healthy.calls, 5)
+
+    def test_throttles_without_retry_after_feed_breaker(self):
+        endpoint = self.classifier.pool.endpoints[0]
+        for _ in range(endpoint.breaker.failure_threshold):
+            self.classifier._record_failure(_throttled(), endpoint, 0.01)
+        self.assertFalse(endpoint.available())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.resilience import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CircuitBreaker
+
+RESET = 0.05
+
+
+def _throttled():
+    import httpx
+    from google.genai.errors import ClientError
+
+    return ClientError(429, httpx.Response(429, json={"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}}))
+
+
+class FakeModels:
+    # Cada chamada executa o próximo comportamento da fila: "429", "hang" ou "ok"; com a fila vazia,
+    # responde "ok" depois de latency segundos
+    def __init__(self, behaviors, latency: float = 0.0):
+        self.behaviors = list(behaviors)
+        self.latency = latency
+
+    async def generate_content(self, model, contents, config=None):
+        behavior = self.behaviors.pop(0) if self.behaviors else "ok"
+        if behavior == "429":
+            raise _throttled()
+        if behavior == "hang":
+            await asyncio.sleep(60)
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text="Produtivo")
+
+
+def _classifier(models, **env):
+    # Classificador com um pool de um endpoint falso; env sobrescreve as variáveis GEMINI_* só durante o teste
+    from app.classifier import EmailClassifier
+    from app.pool import ClientPool
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    with mock.patch.dict(os.environ, env):
+        for name in ("GEMINI_LIMITER_WAIT", "GEMINI_CONCURRENCY"):
+            if name not in env:
+                os.environ.pop(name, None)
+        classifier = EmailClassifier(lazy=True)
+        classifier.pool = ClientPool(["fake"], ["modelo"], lambda key: client)
+    return classifier
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_release_reopens_unresolved_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=RESET)
+        breaker.record_failure()
+        time.sleep(RESET)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.accepting())
+
+        breaker.release()
+        self.assertEqual(breaker.state, OPEN)
+        time.sleep(RESET)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        breaker.release()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_lost_probe_frees_slot_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=RESET, probe_timeout=RESET)
+        breaker.record_failure()
+        time.sleep(RESET)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        time.sleep(RESET)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_starts_at_ceiling_and_only_shrinks_on_throttle(self):
+        limiter = AdaptiveLimiter(max_limit=16)
+        self.assertEqual(limiter.limit, 16)
+        self.assertTrue(all(limiter.try_acquire() for _ in range(16)))
+        self.assertFalse(limiter.try_acquire())
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 8)
+
+
+class HealthyLoadTest(unittest.TestCase):
+    def test_no_fallback_under_concurrent_load(self):
+        # Mais requisições simultâneas que o teto e nenhum 429: as excedentes esperam vaga em vez do fallback
+        classifier = _classifier(FakeModels([], latency=0.3), GEMINI_MAX_CONCURRENCY="16")
+
+        async def burst():
+            return await asyncio.gather(*(classifier._generate_async(f"prompt {i}") for i in range(64)))
+
+        responses = asyncio.run(burst())
+        self.assertTrue(all(resp is not None for resp in responses))
+        self.assertEqual(classifier.pool.rejected, 0)
+        self.assertEqual(classifier.pool.endpoints[0].limiter.limit, 16)
+
+
+class ProbeThroughClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.models = FakeModels([])
+        self.classifier = _classifier(self.models, GEMINI_BREAKER_FAILURES="1", GEMINI_BREAKER_RESET=str(RESET),
+                                      GEMINI_LIMITER_WAIT="0.2")
+        self.classifier.max_retries = 1
+        self.endpoint = self.classifier.pool.endpoints[0]
+
+    def _half_open(self):
+        self.endpoint.breaker.record_failure()
+        time.sleep(RESET)
+        self.assertEqual(self.endpoint.breaker.state, HALF_OPEN)
+
+    def _assert_recovers(self):
+        self.assertEqual(self.endpoint.breaker.state, OPEN)
+        self.assertEqual(self.endpoint.limiter.in_flight, 0)
+        time.sleep(RESET)
+        self.endpoint.limiter._blocked_until = 0.0  # ignora o Retry-After do 429
+        self.models.behaviors.append("ok")
+        resp = asyncio.run(self.classifier._generate_async("prompt"))
+        self.assertEqual(resp.text, "Produtivo")
+        self.assertEqual(self.endpoint.breaker.state, CLOSED)
+
+    def test_probe_ending_in_429(self):
+        self._half_open()
+        self.models.behaviors.append("429")
+        self.assertIsNone(asyncio.run(self.classifier._generate_async("prompt")))
+        self._assert_recovers()
+
+    def test_probe_cancelled(self):
+        self._half_open()
+        self.models.behaviors.append("hang")
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(self.classifier._generate_async("prompt"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_probe())
+        self._assert_recovers()
+
+
+if __name__ == "__main__":
+    unittest.main()